@@ -1,20 +1,29 @@
-import numpy
-import simpy
-import random
+import math
 from times import *
+from tracing import TraceEvent, no_trace
+from txtrace import KIND_DATA, no_record
+from profiling import PhaseProfile, no_phase
+from streams import RandomStreams
+from traffic import FrameQueue
 RTS_global_flag = True
 RTS_transmitter = ""
 
 
 class Ap(object):
-    def __init__(self, env, nid, config, configAP, channel):
+    def __init__(self, env, nid, config, configAP, channel, tracer=None, recorder=None, streams=None):
         self.env = env
+        self.trace = tracer.bind(env, 'ap', nid) if tracer is not None else no_trace
+        self.record = recorder.bind('ap', nid) if recorder is not None else no_record
+        self.profile = PhaseProfile(env) if config.profile_phases else None
+        self.phase = self.profile.wrap if self.profile is not None else no_phase
+        streams = streams if streams is not None else RandomStreams()
+        self.backoff_rng = streams.node_stream('ap', nid, 'backoff')
         self.channel = channel
         self.nid = nid
         self.config = config
         self.configAP = configAP
         self.frame_to_send = None
-        self.times = Times(config.data_size, configAP.mcs, configAP.aifsn, configAP.standard, configAP.nSS)
+        self.times = get_times(config.data_size, configAP.mcs, configAP.aifsn, configAP.standard, configAP.nSS)
         self.N = None  # backoff counter
         self.successful_trans = 0  # number of successful transmissions
         self.total_trans = 0  # total number of transmissions
@@ -23,33 +32,29 @@ class Ap(object):
         self.failed_transmissions_in_row = 0  # used in backoff process
         self.last_succ_trans_end_time = 0  # keeps the end time of the last successful transmission
         self.transmission_delay = 0
-        self.sumTime = 0
+        self.queue = FrameQueue.for_node(configAP, streams.node_generator('ap', nid, 'traffic'), nid)
         self.skip = False
         self.was_sent = False
         self.backoff_interrupt_counter = 0  # i in DB-LBT
-        self.env.process(self.run())
+        self.start()
 
-    def wait_for_frame(self, time_to_wait):
-        yield self.env.timeout(time_to_wait)
-        self.start_generating()
-
-    def start_generating(self):
-        self.sumTime = numpy.random.exponential(1 / self.configAP.poisson_lambda) * 1000
-        self.frame_to_send = self.generate_new_frame()
-        self.env.process(self.wait_for_frame(self.sumTime))
+    def start(self):
+        """Starts the MAC procedure"""
+        self.env.process(self.phase('procedure', self.run()))
 
     def generate_new_frame(self):
+        previous = self.frame_to_send
+        if previous is not None and previous not in self.channel.ongoing_transmissions:
+            previous.release()
         trans_time = self.times.get_ppdu_frame_time(self.configAP.nAMPDU)
-        return TransmissionAP(self.env.now, trans_time, self.config.data_size)
+        return TransmissionAP.acquire(self.env.now, trans_time, self.config.data_size)
 
     def sense_channel(self, slots_to_wait):
-        try:
-            while slots_to_wait > 0:
-                yield self.env.timeout(self.config.observation_slot_duration)
-                slots_to_wait -= 1
-        except simpy.Interrupt:
+        slots_to_wait, interrupted = yield from self.channel.sense_slots(slots_to_wait)
+        if interrupted:
             self.backoff_interrupt_counter += 1
-            pass
+            if self.profile is not None:
+                self.profile.interrupts += 1
         return slots_to_wait
 
     def generate_new_back_off_value(self):
@@ -59,13 +64,13 @@ class Ap(object):
                 back_off_value = self.configAP.initial_det_backoff_value + self.backoff_interrupt_counter
                 self.backoff_interrupt_counter = 0
             else:
-                back_off_value = random.randint(0, self.configAP.switch_mode_periodicity - 1)
+                back_off_value = self.backoff_rng.integers(self.configAP.switch_mode_periodicity)
         else:
             cw_min = self.configAP.cw_min
             cw_max = self.configAP.cw_max
             upper_limit = (pow(2, self.failed_transmissions_in_row) * (cw_min + 1)) - 1
             upper_limit = (upper_limit if upper_limit <= cw_max else cw_max)
-            back_off_value = random.randint(0, upper_limit)
+            back_off_value = self.backoff_rng.integers(upper_limit + 1)
 
         return back_off_value
 
@@ -73,100 +78,75 @@ class Ap(object):
         if self.channel.time_until_free() > 0:
             return
 
-        sensing_process = self.env.process(self.sense_channel(self.N))
-        self.channel.ongoing_senses_ap.append(sensing_process)
+        sensing_process = self.env.process(self.phase('sensing', self.sense_channel(self.N)))
+        self.channel.add_sense(sensing_process)
         remaining_slots = yield sensing_process
-        self.channel.ongoing_senses_ap.remove(sensing_process)
+        self.channel.remove_sense(sensing_process)
         self.N = remaining_slots
 
     def cr_send_rs_signal(self, duration):
-        for p in self.channel.ongoing_senses_gnb:
-            if p.is_alive:
-                p.interrupt()
-        for p in self.channel.ongoing_senses_ap:
-            if p.is_alive:
-                p.interrupt()
+        self.channel.notify_busy()
         yield self.env.timeout(duration)
 
     def cr_sense_channel(self, duration):
-        if self.channel.time_until_free() > 0:
-            return False
-
-        check = False
-        try:
-            yield self.env.timeout(duration)
-            check = True
-        except simpy.Interrupt:
-            pass
-        return check
+        sensed_idle = yield from self.channel.sense_period(duration)
+        if not sensed_idle and self.profile is not None:
+            self.profile.interrupts += 1
+        return sensed_idle
 
     def transmit_ap(self):
         transmission = self.frame_to_send
-        self.channel.ongoing_transmissions_ap.append(transmission)
-        for p in self.channel.ongoing_senses_gnb:
-            if p.is_alive:
-                p.interrupt()
-        for p in self.channel.ongoing_senses_ap:
-            if p.is_alive:
-                p.interrupt()
+        self.channel.add_transmission(transmission)
+        self.channel.notify_busy()
 
         yield self.env.timeout(transmission.airtime_duration)
 
         self.channel.check_collision(transmission)
-        self.channel.ongoing_transmissions_ap.remove(transmission)
+        self.channel.remove_transmission(transmission)
+        self.record(transmission, KIND_DATA)
         return not transmission.collided
 
-    def _log(self, output):
-        return "{:.0f}|AP-{}\t: {}".format(self.env.now, self.nid, output)
-
-    def log(self, output, fail=False, success=False):
-        if self.config.debug:
-            if fail:
-                print("\033[91m" + self._log(output) + "\033[0m")
-            elif success:
-                print("\033[92m" + self._log(output) + "\033[0m")
-            elif self.nid == 0:
-                print("\033[35m" + self._log(output) + "\033[0m")  # highlight one gNB
-            else:
-                print(self._log(output))
-
     def run(self):
-        if self.configAP.poisson_lambda is not None:
-            self.start_generating()
         global RTS_global_flag
 
-        # while True:
-        self.log("begins new transmission procedure")
+        while True:
+            if not self.queue.start_service(self.env.now):
+                next_arrival = self.queue.next_arrival()
+                if next_arrival == math.inf:
+                    return  # trace traffic ended
+                yield self.env.timeout(next_arrival - self.env.now)
+                continue
 
-        if self.configAP.poisson_lambda is None:
+            self.trace(TraceEvent.PROCEDURE_START)
             self.was_sent = False
 
             while not self.was_sent:
 
                 self.N = self.generate_new_back_off_value()
-                self.log(f'has drawn a random backoff counter = {self.N}')
+                self.trace(TraceEvent.BACKOFF_DRAWN, self.N)
 
                 while True:  # CSMA/CA
-                    self.log("(re)starting backoff procedure with DIFS (slots to wait: {})".format(self.N))
+                    self.trace(TraceEvent.BACKOFF_START, self.N)
                     yield self.env.timeout(self.times.DIFSTime)
-                    yield self.env.process(self.wait_random_backoff())
+                    yield self.env.process(self.phase('backoff', self.wait_random_backoff()))
 
                     if self.N == 0:
-                        self.log("Backoff has ended - wait for short switching time from sensing to tx: {}".format(
-                            self.config.cca_tx_switch_time))
+                        self.trace(TraceEvent.BACKOFF_END, self.config.cca_tx_switch_time)
                         yield self.env.timeout(self.config.cca_tx_switch_time)  # Short switching from sensing to TX
                         break
                     else:
-                        self.log("Channel BUSY - backoff is frozen. Remaining slots: {}".format(self.N))
+                        self.trace(TraceEvent.BACKOFF_FROZEN, self.N)
 
                 self.frame_to_send = self.generate_new_frame()
-                self.log(f"is now occupying the channel for the next {self.frame_to_send.airtime_duration} us")
-                self.was_sent = yield self.env.process(self.transmit_ap())
-                self.log(f"frees the channel")
+                self.trace(TraceEvent.TX_START, self.frame_to_send.airtime_duration)
+                self.was_sent = yield self.env.process(self.phase('transmit', self.transmit_ap()))
+                self.trace(TraceEvent.TX_END)
 
                 if self.was_sent:
                     yield self.env.timeout(self.times.get_ack_frame_time())  # wait ack
-                    self.log(f"transmission was successful. Current CW={self.configAP.cw_min}", success=True)
+                    if self.profile is not None:
+                        self.profile.add('ack', self.times.get_ack_frame_time())
+                    self.trace(TraceEvent.TX_SUCCESS, self.configAP.cw_min)
                     self.successful_trans += 1
                     self.successful_airtime += self.frame_to_send.airtime_duration
                     self.failed_transmissions_in_row = 0
@@ -176,20 +156,43 @@ class Ap(object):
                 else:
                     self.failed_transmissions_in_row += 1
                     yield self.env.timeout(self.times.ack_timeout)
+                    if self.profile is not None:
+                        self.profile.add('ack', self.times.ack_timeout)
                     if self.frame_to_send.number_of_retransmissions > self.configAP.retry_limit:
                         self.frame_to_send = self.generate_new_frame()
                         self.failed_transmissions_in_row = 0
-                    self.log(f"transmission resulted in a collision !!!!!!!!!!!!!!!!!!!!!", fail=True)
+                    self.trace(TraceEvent.TX_COLLISION)
 
                 self.total_trans += 1
                 self.total_airtime += self.frame_to_send.airtime_duration
 
+            self.queue.finish_service(self.env.now)
+
 
 class TransmissionAP:
+    __slots__ = ('start_time', 'airtime_duration', 'data_size', 'end_time', 'number_of_retransmissions', 'collided')
+    _pool = list()  # released records, reused by acquire
+
     def __init__(self, start_time, airtime_duration, data_size):
+        self.reset(start_time, airtime_duration, data_size)
+
+    def reset(self, start_time, airtime_duration, data_size):
         self.start_time = start_time
         self.airtime_duration = airtime_duration
         self.data_size = data_size
         self.end_time = start_time + airtime_duration
         self.number_of_retransmissions = 0
         self.collided = False
+
+    @classmethod
+    def acquire(cls, start_time, airtime_duration, data_size):
+        """Record from the pool of released ones (or a new one)"""
+        if cls._pool:
+            transmission = cls._pool.pop()
+            transmission.reset(start_time, airtime_duration, data_size)
+            return transmission
+        return cls(start_time, airtime_duration, data_size)
+
+    def release(self):
+        """Returns the record to the pool, it must not be used afterwards"""
+        self._pool.append(self)
@@ -0,0 +1,199 @@
+"""
+Simulator throughput benchmarks over a fixed matrix of strategies, node counts and simulated times.
+
+    python benchmark.py run [-o benchmarks/<name>.json] [--nodes 1 2 5] [--sim-times 0.1 1] [--repeat 3]
+                            [--backend callback]
+    python benchmark.py compare benchmarks/old.json benchmarks/new.json [--threshold 0.1]
+
+Every case runs in a fresh worker process, so its peak RSS is its own. compare exits with status 1 when a case
+got slower (events/s) or bigger (peak RSS) than the threshold allows. The events of the callback backend are the
+timers its EventLoop fires, so compare the wall time of the two backends rather than their events.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy
+import simpy
+
+import coexistence
+from config import Config, ConfigGNB, Gap, Strategy
+from eventcore import EventLoop
+
+NODE_COUNTS = (1, 2, 5, 10, 20, 40)  # total nodes, split evenly between gNBs and APs (extra one is a gNB)
+SIM_TIMES = (0.1, 1.0, 10.0)  # seconds
+SEED = 1
+
+
+class CountingEnvironment(simpy.Environment):
+    """SimPy environment that counts the events it processes"""
+
+    def __init__(self, initial_time=0):
+        super().__init__(initial_time)
+        self.events_processed = 0
+
+    def step(self):
+        super().step()
+        self.events_processed += 1
+
+
+def strategy_cases():
+    """(strategy, gap) of every strategy, GAP_PERIOD once per gap type"""
+    return [(Strategy.GAP_PERIOD, gap) for gap in Gap] + \
+           [(strategy, None) for strategy in Strategy if strategy != Strategy.GAP_PERIOD]
+
+
+def case_name(case):
+    method = case['strategy'] if case['gap'] is None else "{}-{}".format(case['strategy'], case['gap'])
+    name = "{}/n={}/t={}".format(method, case['num_of_gnb'] + case['num_of_ap'], case['sim_time'])
+    return name if case['backend'] == 'simpy' else "{}/{}".format(name, case['backend'])
+
+
+def benchmark_cases(node_counts=NODE_COUNTS, sim_times=SIM_TIMES, backend='simpy'):
+    cases = list()
+    for strategy, gap in strategy_cases():
+        for nodes in node_counts:
+            for sim_time in sim_times:
+                cases.append({'strategy': strategy.name, 'gap': gap.name if gap is not None else None,
+                              'num_of_gnb': nodes - nodes // 2, 'num_of_ap': nodes // 2, 'sim_time': sim_time,
+                              'seed': SEED, 'backend': backend})
+    return cases
+
+
+def run_case(case):
+    """Worker entry point: runs one case and measures it"""
+    configGNB = ConfigGNB(strategy=Strategy[case['strategy']])
+    if case['gap'] is not None:
+        configGNB.gap_type = Gap[case['gap']]
+    config = Config(sim_time=case['sim_time'], backend=case['backend'])
+    env = CountingEnvironment() if case['backend'] == 'simpy' else EventLoop()
+    result = dict(case, name=case_name(case))
+    start = time.perf_counter()
+    try:
+        coexistence.run_simulation(case['num_of_gnb'], case['num_of_ap'], case['seed'], configGNB=configGNB, env=env,
+                                   config=config)
+    except Exception as e:
+        result['error'] = "{}: {}".format(type(e).__name__, e)
+        return result
+    wall_time = time.perf_counter() - start
+    events = env.events_processed if case['backend'] == 'simpy' else env.timers_fired
+    result.update({'wall_time': wall_time,
+                   'events': events,
+                   'events_per_second': events / wall_time,
+                   'events_per_sim_second': events / case['sim_time'],
+                   'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+    return result
+
+
+def best_of(results):
+    """Fastest of the repeats of a case"""
+    ok = [r for r in results if 'error' not in r]
+    return min(ok, key=lambda r: r['wall_time']) if ok else results[0]
+
+
+def source_version():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=directory, capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=directory,
+                               capture_output=True, text=True).stdout.strip() != ''
+    except OSError:
+        return None, None
+    return commit or None, dirty
+
+
+def run_benchmarks(cases, repeat=1):
+    results = list()
+    with Pool(1, maxtasksperchild=1) as pool:
+        for case in cases:
+            result = best_of([pool.apply(run_case, (case,)) for _ in range(repeat)])
+            if 'error' in result:
+                print("{:45s} ERROR {}".format(result['name'], result['error']))
+            else:
+                print("{:45s} {:8.2f} s {:10d} events {:9.0f} events/s {:7.1f} MB".format(
+                    result['name'], result['wall_time'], result['events'], result['events_per_second'],
+                    result['peak_rss_mb']))
+            results.append(result)
+    commit, dirty = source_version()
+    return {'meta': {'commit': commit,
+                     'dirty': dirty,
+                     'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+                     'python': platform.python_version(),
+                     'simpy': simpy.__version__,
+                     'numpy': numpy.__version__,
+                     'machine': platform.platform(),
+                     'repeat': repeat},
+            'cases': results}
+
+
+def compare(old, new, threshold=0.1):
+    """Prints the change of every case and returns the names of the regressed ones"""
+    old_cases = {case['name']: case for case in old['cases']}
+    regressions = list()
+    for case in new['cases']:
+        before = old_cases.get(case['name'])
+        if before is None or 'error' in before or 'error' in case:
+            if case.get('error') and not (before or {}).get('error'):
+                regressions.append(case['name'])
+                print("{:45s} REGRESSION now fails: {}".format(case['name'], case['error']))
+            continue
+        speed = case['events_per_second'] / before['events_per_second'] - 1
+        memory = case['peak_rss_mb'] / before['peak_rss_mb'] - 1
+        wall = case['wall_time'] / before['wall_time'] - 1
+        regressed = speed < -threshold or memory > threshold
+        if regressed:
+            regressions.append(case['name'])
+        note = " (events {} -> {})".format(before['events'], case['events']) if before['events'] != case['events'] else ""
+        print("{:45s} wall {:+7.1%} events/s {:+7.1%} rss {:+7.1%}{}{}".format(
+            case['name'], wall, speed, memory, note, "  REGRESSION" if regressed else ""))
+    print("{} regression(s) over {:.0%}".format(len(regressions), threshold))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="simulator throughput benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help="run the benchmark matrix")
+    run.add_argument('-o', '--output', default=None, help="JSON output (default benchmarks/<commit>.json)")
+    run.add_argument('--nodes', type=int, nargs='+', default=NODE_COUNTS)
+    run.add_argument('--sim-times', type=float, nargs='+', default=SIM_TIMES)
+    run.add_argument('--strategies', nargs='+', default=None,
+                     help="strategy or strategy-gap names to run, e.g. DB_LBT GAP_PERIOD-BEFORE (default all)")
+    run.add_argument('--repeat', type=int, default=1, help="runs per case, the fastest is kept")
+    run.add_argument('--backend', choices=('simpy', 'callback'), default='simpy', help="simulation core to measure")
+    cmp = commands.add_parser('compare', help="compare two benchmark files")
+    cmp.add_argument('old')
+    cmp.add_argument('new')
+    cmp.add_argument('--threshold', type=float, default=0.1, help="relative slowdown/growth flagged as a regression")
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        with open(args.old) as old_file, open(args.new) as new_file:
+            return 1 if compare(json.load(old_file), json.load(new_file), args.threshold) else 0
+
+    cases = benchmark_cases(args.nodes, args.sim_times, args.backend)
+    if args.strategies is not None:
+        cases = [case for case in cases if case_name(case).split('/')[0] in args.strategies
+                 or case['strategy'] in args.strategies]
+    report = run_benchmarks(cases, args.repeat)
+    output = args.output
+    if output is None:
+        commit, dirty = report['meta']['commit'], report['meta']['dirty']
+        output = os.path.join('benchmarks', "{}{}.json".format((commit or 'unknown')[:12], '-dirty' if dirty else ''))
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as output_file:
+        json.dump(report, output_file, indent=1)
+    print("benchmark written to", output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
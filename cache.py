@@ -0,0 +1,88 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+from enum import Enum
+
+from config import Config, ConfigGNB, ConfigAP
+
+SOURCE_FILES = ('ap.py', 'channel.py', 'coexistence.py', 'config.py', 'eventcore.py', 'gnb.py', 'profiling.py', 'stats.py',
+                'strategies.py', 'streams.py', 'times.py', 'tracing.py', 'traffic.py', 'txtrace.py')  # code behind run_simulation
+IGNORED_FIELDS = {'debug', 'trace', 'trace_capacity', 'trace_nodes', 'trace_events', 'trace_path', 'transmission_trace_path',
+                  'variate_block_size', 'num_processes', 'cache_path', 'results_format', 'results_flush_rows', 'min_seeds',
+                  'max_seeds', 'ci_level', 'ci_metrics', 'ci_relative_width', 'ci_absolute_width'}  # settings that do not change simulation results
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """Hash of the simulator sources, cached results are only reused by the code that produced them"""
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in SOURCE_FILES:
+        with open(os.path.join(directory, name), 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+def describe(obj):
+    """Canonical JSON-friendly description of a config object (fields, property backing values and class defaults)"""
+    if isinstance(obj, Enum):
+        return obj.name
+    if isinstance(obj, (list, tuple)):
+        return [describe(o) for o in obj]
+    if not hasattr(obj, '__dict__'):
+        return obj
+    names = set(vars(obj))
+    for name in dir(type(obj)):
+        value = getattr(type(obj), name)
+        if not name.startswith('__') and not callable(value) and not isinstance(value, property):
+            names.add(name)
+    return {name: describe(getattr(obj, name)) for name in sorted(names - IGNORED_FIELDS)}
+
+
+def scenario_key(num_of_gnb, num_of_ap, seed, configGNB=None, configAP=None, config=None, **overrides):
+    """Canonical hash of everything a run_simulation call depends on"""
+    scenario = {
+        'version': code_version(),
+        'sim_time': config.sim_time if config is not None else Config.sim_time,  # default: the class attribute
+        'config': describe(config if config is not None else Config()),
+        'configGNB': describe(configGNB if configGNB is not None else ConfigGNB()),
+        'configAP': describe(configAP if configAP is not None else ConfigAP()),
+        'num_of_gnb': num_of_gnb,
+        'num_of_ap': num_of_ap,
+        'seed': seed,
+        'overrides': describe(overrides),
+    }
+    return hashlib.sha256(json.dumps(scenario, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache(object):
+    """SQLite store of raw run_simulation results keyed by scenario_key, plus the CSV rows already written for them"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, results TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS rows (key TEXT, filename TEXT, PRIMARY KEY (key, filename))")
+        self.connection.commit()
+
+    def get(self, key):
+        row = self.connection.execute("SELECT results FROM results WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, key, results):
+        self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?)", (key, json.dumps(results)))
+        self.connection.commit()
+
+    def has_row(self, key, filename):
+        return self.connection.execute("SELECT 1 FROM rows WHERE key = ? AND filename = ?", (key, filename)).fetchone() is not None
+
+    def add_row(self, key, filename):
+        self.connection.execute("INSERT OR IGNORE INTO rows VALUES (?, ?)", (key, filename))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
@@ -1,25 +1,117 @@
+import heapq
+import math
 import simpy
 
+SLOT_EPSILON = 1e-9  # tolerance for float drift in slot boundaries (us)
+
+
+def observed_slots(elapsed, slot_duration, max_slots):
+    """Number of whole observation slots that fit into the elapsed sensing time (a slot ending right now counts)"""
+    return min(math.floor(elapsed / slot_duration + SLOT_EPSILON), max_slots)
+
 
 class Channel(object):
-    def __init__(self, env):
+    def __init__(self, env, config):
         self.env = env
+        self.config = config
+        self.sense_mode = config.sense_mode
 
-        self.ongoing_transmissions_gnb = list()
-        self.ongoing_transmissions_ap = list()
-        self.ongoing_senses_gnb = list()
-        self.ongoing_senses_ap = list()
+        self.ongoing_transmissions = dict()  # transmission -> sequence number of its entry in the busy-until heap
+        self.ongoing_senses = list()  # sensing processes to interrupt (only used in 'interrupt' sense mode)
         self.bytes_sent = 0
+        self.busy = env.event()  # succeeds when a transmission starts and is then replaced by a fresh event
+        self.idle = env.event()  # succeeds when the channel becomes free and is then replaced by a fresh event
+        self._busy_until = list()  # max-heap of (-end_time, seq, transmission), stale entries are dropped lazily
+        self._seq = 0
+
+    def add_transmission(self, transmission):
+        self._seq += 1
+        self.ongoing_transmissions[transmission] = self._seq
+        heapq.heappush(self._busy_until, (-transmission.end_time, self._seq, transmission))
+
+    def remove_transmission(self, transmission):
+        del self.ongoing_transmissions[transmission]
+        if self.idle.callbacks and self.time_until_free() == 0:
+            idle, self.idle = self.idle, self.env.event()
+            idle.succeed()
+
+    def add_sense(self, process):
+        if self.sense_mode == 'interrupt':
+            self.ongoing_senses.append(process)
+
+    def remove_sense(self, process):
+        if self.sense_mode == 'interrupt':
+            self.ongoing_senses.remove(process)
+
+    def notify_busy(self):
+        """Wakes up every node sensing the channel, called whenever a transmission or RS signal starts"""
+        if self.sense_mode == 'interrupt':
+            for p in self.ongoing_senses:
+                if p.is_alive:
+                    p.interrupt()
+        elif self.busy.callbacks:
+            busy, self.busy = self.busy, self.env.event()
+            busy.succeed()
+
+    def wait_until_free(self, waiting_time):
+        """Event to wait on while the channel is busy for (at least) waiting_time"""
+        if self.sense_mode == 'interrupt':
+            return self.env.timeout(waiting_time)
+        return self.idle
+
+    def sense_slots(self, slots_to_wait):
+        """
+        Counts down observation slots while the channel stays idle (delegate to it with yield from).
+        Returns the number of slots left and whether the countdown was stopped by a transmission.
+        """
+        slot_duration = self.config.observation_slot_duration
+        per_slot = self.config.backoff_countdown == 'per_slot'
+        start_time = self.env.now
+
+        if self.sense_mode != 'interrupt':
+            busy = self.busy
+            if per_slot:
+                while slots_to_wait > 0 and not busy.triggered:
+                    slot_start_time = self.env.now
+                    yield self.env.timeout(slot_duration) | busy
+                    slots_to_wait -= observed_slots(self.env.now - slot_start_time, slot_duration, 1)
+            elif slots_to_wait > 0:
+                yield self.env.timeout(slots_to_wait * slot_duration) | busy
+                slots_to_wait -= observed_slots(self.env.now - start_time, slot_duration, slots_to_wait)
+            return slots_to_wait, slots_to_wait > 0
+
+        try:
+            if per_slot:
+                while slots_to_wait > 0:
+                    yield self.env.timeout(slot_duration)
+                    slots_to_wait -= 1
+            elif slots_to_wait > 0:
+                yield self.env.timeout(slots_to_wait * slot_duration)
+                slots_to_wait = 0
+        except simpy.Interrupt:
+            if not per_slot:
+                slots_to_wait -= observed_slots(self.env.now - start_time, slot_duration, slots_to_wait)
+            return slots_to_wait, True
+        return slots_to_wait, False
+
+    def sense_period(self, duration):
+        """Senses the channel for a fixed period (delegate to it with yield from), returns True if it stayed idle"""
+        if self.time_until_free() > 0:
+            return False
+
+        start_time = self.env.now
+        if self.sense_mode != 'interrupt':
+            yield self.env.timeout(duration) | self.busy
+            return self.env.now - start_time >= duration - SLOT_EPSILON
+
+        try:
+            yield self.env.timeout(duration)
+        except simpy.Interrupt:
+            return False
+        return True
 
     def check_collision(self, transmission):
-        for t in self.ongoing_transmissions_gnb:
-            check_end = t.end_time > transmission.start_time
-            check_start = t.start_time < transmission.end_time
-            check_self = transmission is not t
-            if check_end and check_start and check_self:
-                transmission.collided = True
-                t.collided = True
-        for t in self.ongoing_transmissions_ap:
+        for t in self.ongoing_transmissions:
             check_end = t.end_time > transmission.start_time
             check_start = t.start_time < transmission.end_time
             check_self = transmission is not t
@@ -28,16 +120,12 @@ class Channel(object):
                 t.collided = True
 
     def time_until_free(self):
-        max_time = 0
-
-        for t in self.ongoing_transmissions_gnb:
-            time_left = t.end_time - self.env.now
-            if time_left > max_time:
-                max_time = time_left
-        for t in self.ongoing_transmissions_ap:
-            time_left = t.end_time - self.env.now
-            if time_left > max_time:
-                max_time = time_left
-
-        return max_time
+        heap = self._busy_until
+        while heap and self.ongoing_transmissions.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)  # transmission has already left the channel
+        if not heap:
+            return 0
+
+        time_left = -heap[0][0] - self.env.now
+        return time_left if time_left > 0 else 0
 
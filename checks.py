@@ -0,0 +1,122 @@
+"""
+Runnable checks of the claims the simulator's speed-ups and statistics rely on:
+
+    python checks.py [convergence callback slotted reference ...] [--update]
+
+Every check prints what it measured and raises AssertionError when its claim does not hold. The reference check compares
+fixed-seed runs with the results recorded in checks_reference.json (--update records the current ones), so a change that
+claims to keep results identical can be checked against the tree before it.
+"""
+
+import argparse
+import json
+import os
+
+import eventcore
+import slotted
+from coexistence import run_simulation
+from config import Config, ConfigAP, ConfigGNB, Gap, Strategy
+
+# strategy (and gap type of the gap period) configurations the backend checks cover
+CASES = [(Strategy.GAP_PERIOD, gap) for gap in Gap] + [(strategy, None) for strategy in Strategy
+                                                        if strategy != Strategy.GAP_PERIOD]
+
+REFERENCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'checks_reference.json')
+
+
+def case_name(strategy, gap):
+    return strategy.name if gap is None else "{} {}".format(strategy.name, gap.name)
+
+
+def case_config(strategy, gap):
+    return ConfigGNB(strategy=strategy) if gap is None else ConfigGNB(strategy=strategy, gap_type=gap)
+
+
+def check_convergence(tolerances=(0.1, 0.05, 0.02), num_nodes=3, seed=1):
+    """The early stop (Config.convergence_tolerance) runs longer as the tolerance is tightened"""
+    configGNB = ConfigGNB(strategy=Strategy.DB_LBT)
+    stop_times = list()
+    for tolerance in tolerances:
+        config = Config(sim_time=30, convergence_tolerance=tolerance)
+        stop_times.append(run_simulation(num_nodes, num_nodes, seed, configGNB=configGNB, config=config)[0]['sim_time'])
+        print("convergence_tolerance {}: stopped after {:.1f} s".format(tolerance, stop_times[-1]))
+    assert stop_times == sorted(stop_times) and stop_times[-1] > stop_times[0], \
+        "stop times {} do not grow as the tolerance is tightened".format(stop_times)
+
+
+def check_callback_backend(seeds=range(1, 21), num_nodes=3, sim_time=0.5, max_t=3.5):
+    """The callback backend agrees with the SimPy one (Welch's t of every metric) for every strategy and gap type"""
+    config = Config(sim_time=sim_time)
+    worst = dict()
+    for strategy, gap in CASES:
+        print("-- {}".format(case_name(strategy, gap)))
+        t_stats = eventcore.compare_with_simpy(num_nodes, num_nodes, list(seeds), configGNB=case_config(strategy, gap),
+                                               config=config)
+        worst[(strategy, gap)] = max(abs(t) for t in t_stats.values())
+    failed = [case for case, t in worst.items() if t >= max_t]
+    assert not failed, "the backends differ (|t| >= {}) for {}".format(max_t, failed)
+
+
+def check_slotted(seeds=range(1, 31), num_nodes=3, sim_time=0.5, max_t=3.5):
+    """The slotted engine agrees with run_simulation (Welch's t of every metric) for every scenario it models"""
+    config = Config(sim_time=sim_time)
+    configGNB = ConfigGNB(strategy=Strategy.DB_LBT)
+    scenarios = [('DB_LBT gNBs, CSMA/CA APs', num_nodes, ConfigAP()),
+                 ('DB_LBT gNBs, DB-LBT APs', num_nodes, ConfigAP(db_lbt=True)),
+                 ('CSMA/CA APs only', 0, ConfigAP())]
+    worst = dict()
+    for name, num_of_gnb, configAP in scenarios:
+        print("-- {}".format(name))
+        t_stats = slotted.compare_with_simpy(num_of_gnb, num_nodes, list(seeds), configGNB=configGNB, configAP=configAP,
+                                             config=config)
+        worst[name] = max(abs(t) for t in t_stats.values())
+    failed = [name for name, t in worst.items() if t >= max_t]
+    assert not failed, "the engines differ (|t| >= {}) for {}".format(max_t, failed)
+
+
+def reference_results(seed=7, num_nodes=3, sim_time=0.2):
+    """run_simulation results of every case and backend at a fixed seed, keyed by 'backend case'"""
+    results = dict()
+    for backend in ('simpy', 'callback'):
+        config = Config(sim_time=sim_time, backend=backend)
+        for strategy, gap in CASES:
+            results["{} {}".format(backend, case_name(strategy, gap))] = run_simulation(
+                num_nodes, num_nodes, seed, configGNB=case_config(strategy, gap), config=config)
+    return results
+
+
+def record_reference():
+    with open(REFERENCE_FILE, 'w') as f:
+        json.dump(reference_results(), f, indent=1, sort_keys=True)
+    print("recorded {}".format(REFERENCE_FILE))
+
+
+def check_reference():
+    """Fixed-seed runs of every case and backend give the results recorded in checks_reference.json"""
+    with open(REFERENCE_FILE) as f:
+        reference = json.load(f)
+    results = json.loads(json.dumps(reference_results()))  # same float and key representation as the recorded ones
+    changed = sorted(name for name in reference if results.get(name) != reference[name])
+    print("{} of {} runs identical to the reference".format(len(reference) - len(changed), len(reference)))
+    assert not changed, "results changed for {}".format(changed)
+
+
+CHECKS = {'convergence': check_convergence,
+          'callback': check_callback_backend,
+          'slotted': check_slotted,
+          'reference': check_reference}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="run the simulator checks")
+    parser.add_argument('checks', nargs='*', help="checks to run: {} (default all)".format(', '.join(CHECKS)))
+    parser.add_argument('--update', action='store_true', help="record the reference results before running the checks")
+    args = parser.parse_args()
+    for name in args.checks:
+        if name not in CHECKS:
+            parser.error("unknown check: {}".format(name))
+    if args.update:
+        record_reference()
+    for name in args.checks or CHECKS:
+        print("== {}".format(name))
+        CHECKS[name]()
@@ -1,33 +1,83 @@
+import copy
+import dataclasses
+import hashlib
+import json
+import math
+import numpy
 import simpy
 import time
 import csv
 import os
-import random
+import pickle
+from dataclasses import dataclass
+from multiprocessing import Pool
 
+from cache import ResultCache, describe, scenario_key
 from channel import Channel
+from columnar import ColumnarSink
 from gnb import GnB
 from ap import Ap
 from config import Config, ConfigGNB, ConfigAP, Gap, Strategy
+from eventcore import CallbackAp, CallbackChannel, CallbackGnB, EventLoop
+from tracing import Tracer
+from txtrace import TransmissionRecorder
+from stats import BatchMeans, confidence_interval, mser, required_samples
+from streams import RandomStreams
 
+# environment, channel, gNB and AP classes of the Config.backend values
+BACKENDS = {'simpy': (simpy.Environment, Channel, GnB, Ap),
+            'callback': (EventLoop, CallbackChannel, CallbackGnB, CallbackAp)}
 
-def random_sample(max_number, number, min_distance=0):
-    samples = random.sample(range(max_number - (number - 1) * (min_distance - 1)), number)
+
+def backend_classes(config):
+    """(environment, channel, gNB, AP) classes of config.backend"""
+    if config.backend not in BACKENDS:
+        raise ValueError("unknown backend: {} ({})".format(config.backend, ', '.join(BACKENDS)))
+    return BACKENDS[config.backend]
+
+
+def random_sample(max_number, number, min_distance=0, rng=None):
+    rng = rng if rng is not None else numpy.random.default_rng()
+    samples = rng.choice(max_number - (number - 1) * (min_distance - 1), number, replace=False).tolist()
     indices = sorted(range(len(samples)), key=lambda i: samples[i])
     ranks = sorted(indices, key=lambda i: indices[i])
     return [sample + (min_distance - 1) * rank for sample, rank in zip(samples, ranks)]
 
 
 def run_simulation(num_of_gnb, num_of_ap, seed, desyncs=None, thi=None, num_cr_slots=None,
-                   switch_mode_periodicity=None, switch_mode_threshold=None, initial_det_backoff_value=None):
-
-    random.seed(seed)
-    env = simpy.Environment()
-    channel = Channel(env)
-    config = Config()
-    configGNB = ConfigGNB()
+                   switch_mode_periodicity=None, switch_mode_threshold=None, initial_det_backoff_value=None,
+                   configGNB=None, configAP=None, tracer=None, recorder=None, env=None, config=None):
+    """
+    config: Config of the run (default: Config() with the Config.sim_time class attribute)
+    env: environment to run in (default: a new one of config.backend, a simpy.Environment or eventcore.EventLoop)
+    tracer: records the node events of the run (default: a tracing.Tracer from the Config trace settings, if enabled)
+    recorder: records every transmission of the run (default: a txtrace.TransmissionRecorder writing to
+    Config.transmission_trace_path, if set, closed at the end of the run)
+
+    Every node draws from its own streams.RandomStreams generators spawned from seed, so a seed reproduces the run
+    exactly and runs of different strategies with the same seed share their random numbers.
+
+    Results leave out the warm-up set by config.warmup (fixed length or MSER-5), their sim_time is the measured
+    time only. The MSER-5 warm-up needs the whole run, so it can not be combined with config.convergence_tolerance
+    (ValueError).
+    """
+    if config is None:
+        config = Config()
+        config.sim_time = Config.sim_time  # the class attribute is the global default
+    if config.warmup == 'mser' and config.convergence_tolerance is not None:
+        raise ValueError("warmup='mser' observes the whole run, it can not stop early (convergence_tolerance={})".format(
+            config.convergence_tolerance))
+    environment_class, channel_class, _, _ = backend_classes(config)
+    env = env if env is not None else environment_class()
+    channel = channel_class(env, config)
+    own_tracer = tracer is None
+    tracer = Tracer.from_config(config) if own_tracer else tracer
+    own_recorder = recorder is None
+    recorder = TransmissionRecorder.from_config(config) if own_recorder else recorder
+    configGNB = copy.deepcopy(configGNB) if configGNB is not None else ConfigGNB()
     if thi is not None:
         configGNB.prob_rs_next_slots = thi
-    if configGNB.strategy == Strategy.GCR_LBT or configGNB.strategy == Strategy.DCRB_LBT:
+    if configGNB.strategy == Strategy.GCR_LBT:
         configGNB.sync_slot_duration = configGNB.mini_slot_duration
         if num_cr_slots is not None:
             configGNB.num_cr_slots = num_cr_slots
@@ -37,33 +87,94 @@ def run_simulation(num_of_gnb, num_of_ap, seed, desyncs=None, thi=None, num_cr_s
         configGNB.switch_mode_threshold = switch_mode_threshold
         configGNB.initial_det_backoff_value = initial_det_backoff_value
 
-    configAP = ConfigAP()
-
+    configAP = copy.deepcopy(configAP) if configAP is not None else ConfigAP()
+
+    gnb_list, ap_list = create_nodes(env, channel, num_of_gnb, num_of_ap, seed, config, configGNB, configAP, desyncs,
+                                     tracer, recorder)
+
+    end_time = config.sim_time * 1e6
+    nodes = gnb_list + ap_list
+    measure_start = 0
+    if config.warmup == 'mser':
+        measure_start = run_mser_warmup(env, gnb_list, ap_list, end_time, config.warmup_interval * 1e6)
+    else:
+        if config.warmup:
+            env.run(until=min(config.warmup * 1e6, end_time))
+            reset_statistics(nodes)
+            measure_start = env.now
+        if config.convergence_tolerance is None:
+            env.run(until=end_time)
+        else:
+            monitor = BatchMeans([[node.successful_airtime, node.successful_trans] for node in nodes],
+                                 [range(len(gnb_list)), range(len(gnb_list), len(nodes))])
+            while env.now < end_time:
+                env.run(until=min(env.now + config.convergence_batch * 1e6, end_time))
+                monitor.add([[node.successful_airtime, node.successful_trans] for node in nodes])
+                if monitor.converged(config.convergence_tolerance, config.ci_level, config.convergence_min_batches):
+                    break
+    sim_time = (env.now - measure_start) / 1e6  # simulated time the results cover
+    if own_tracer and tracer is not None:
+        tracer.dump(config.trace_path)
+    if own_recorder and recorder is not None:
+        recorder.close()
+
+    return node_results(gnb_list, ap_list, sim_time, config)
+
+
+def run_mser_warmup(env, gnb_list, ap_list, end_time, interval):
+    """
+    Runs to end_time in intervals, then deletes the warm-up the MSER-5 rule finds in the per-interval successful
+    airtime of each node type (the longest of the two) from the node counters. Returns the start of the measurement.
+    """
+    nodes = gnb_list + ap_list
+    snapshots = [statistics_snapshot(nodes)]
+    airtime = list()
+    while True:
+        airtime.append([sum(node.successful_airtime for node in node_list) for node_list in (gnb_list, ap_list)])
+        if env.now >= end_time:
+            break
+        env.run(until=min(env.now + interval, end_time))
+        snapshots.append(statistics_snapshot(nodes))
+    per_interval = numpy.diff(numpy.array(airtime), axis=0)
+    truncation = max(mser(per_interval[:, 0]), mser(per_interval[:, 1]))
+    subtract_statistics(nodes, snapshots[truncation])
+    return truncation * interval
+
+
+def create_nodes(env, channel, num_of_gnb, num_of_ap, seed, config, configGNB, configAP, desyncs=None, tracer=None,
+                 recorder=None):
+    """gNBs and APs of a run on channel, all nodes of a type share their configuration object"""
+    streams = RandomStreams(seed, config.variate_block_size)
     if desyncs is None:
         """
         random desync offsets, but every value is at least MIN_SYNC_SLOT_DESYNC as far from any other value
         """
         desyncs = random_sample(
-            configGNB.max_sync_slot_desync - configGNB.min_sync_slot_desync, num_of_gnb, configGNB.min_sync_slot_desync)
+            configGNB.max_sync_slot_desync - configGNB.min_sync_slot_desync, num_of_gnb, configGNB.min_sync_slot_desync,
+            streams.run_stream())
         """
         random offset from a set (set contains values with step of MIN_SYNC_SLOT_DESYNC)
         desync_set = list(np.linspace(0, MAX_SYNC_SLOT_DESYNC, num=int(MAX_SYNC_SLOT_DESYNC/MIN_SYNC_SLOT_DESYNC)+1))[:-1]
         desyncs = [random.choice(desync_set) for _ in range(0, nr_of_gnbs)]
         """
 
+    _, _, gnb_class, ap_class = backend_classes(config)
     gnb_list = list()
     ap_list = list()
 
     for i in range(num_of_gnb):
-        gnb = GnB(env, i, config, configGNB, channel, desyncs[i], Strategy, Gap)
+        gnb = gnb_class(env, i, config, configGNB, channel, desyncs[i], Strategy, Gap, tracer, recorder, streams)
         gnb_list.append(gnb)
 
     for j in range(num_of_ap):
-        ap = Ap(env, j, config, configAP, channel)
+        ap = ap_class(env, j, config, configAP, channel, tracer, recorder, streams)
         ap_list.append(ap)
 
-    env.run(until=(Config.sim_time * 1e6))
+    return gnb_list, ap_list
 
+
+def node_results(gnb_list, ap_list, sim_time, config):
+    """run_simulation results of the nodes"""
     results = list()
     for gnb in gnb_list:
         results.append({'id': gnb.nid,
@@ -74,7 +185,8 @@ def run_simulation(num_of_gnb, num_of_ap, seed, desyncs=None, thi=None, num_cr_s
                         'coll_percent': 1 - gnb.successful_trans / gnb.total_trans if gnb.total_trans > 0 else None,
                         'total_airtime': gnb.total_airtime,
                         'succ_airtime': gnb.successful_airtime,
-                        'trans_delay': gnb.transmission_delay / gnb.successful_trans})
+                        'trans_delay': gnb.transmission_delay / gnb.successful_trans if gnb.successful_trans > 0 else math.nan,
+                        'sim_time': sim_time})
 
     for ap in ap_list:
         results.append({'id': ap.nid,
@@ -85,13 +197,146 @@ def run_simulation(num_of_gnb, num_of_ap, seed, desyncs=None, thi=None, num_cr_s
                         'coll_percent': 1 - ap.successful_trans / ap.total_trans if ap.total_trans > 0 else None,
                         'total_airtime': ap.total_airtime,
                         'succ_airtime': ap.successful_airtime,
-                        'trans_delay': ap.transmission_delay / ap.successful_trans})
+                        'trans_delay': ap.transmission_delay / ap.successful_trans if ap.successful_trans > 0 else math.nan,
+                        'sim_time': sim_time})
+
+    for res, node in zip(results, gnb_list + ap_list):
+        res.update(node.queue.report())
+        if config.profile_phases:
+            res.update(node.profile.report())
+
+    return results
+
 
+NODE_STATISTICS = ('successful_trans', 'total_trans', 'total_airtime', 'successful_airtime', 'transmission_delay')
+QUEUE_STATISTICS = ('arrived', 'dropped', 'served', 'delay')
+
+
+def reset_statistics(nodes):
+    """Restarts the result counters of nodes, results then cover the time since the reset only"""
+    for node in nodes:
+        for name in NODE_STATISTICS:
+            setattr(node, name, 0)
+        node.queue.reset_statistics()
+
+
+def statistics_snapshot(nodes):
+    """Current result counters of nodes"""
+    return [([getattr(node, name) for name in NODE_STATISTICS], [getattr(node.queue, name) for name in QUEUE_STATISTICS])
+            for node in nodes]
+
+
+def subtract_statistics(nodes, snapshot):
+    """Removes the counts up to a statistics_snapshot from nodes, results then cover the time since the snapshot"""
+    for node, (node_values, queue_values) in zip(nodes, snapshot):
+        for name, value in zip(NODE_STATISTICS, node_values):
+            setattr(node, name, getattr(node, name) - value)
+        for name, value in zip(QUEUE_STATISTICS, queue_values):
+            setattr(node.queue, name, getattr(node.queue, name) - value)
+
+
+def run_branched(num_of_gnb, num_of_ap, seed, variants, warmup, configGNB=None, configAP=None, config=None,
+                 processes=None):
+    """
+    Simulates the warm-up of a run once and continues it once per variant: a variant is a dict of ConfigGNB fields set
+    at the end of the warm-up. Each variant runs in a forked child process (copy-on-write snapshot of the warmed-up
+    network), at most processes (default Config.num_processes, None = one per core) at a time. Without os.fork the
+    warm-up is simulated again for every variant, which gives the same results.
+    A variant may change the strategy or gap type too; a strategy variant also gets the sync slot duration run_simulation
+    uses for it (the mini-slot for GCR-LBT) unless it sets sync_slot_duration itself.
+    Returns the run_simulation results of every variant, counted from the end of the warm-up.
+
+    warmup: warm-up length (s), shorter than config.sim_time. Every variant runs until config.sim_time, so
+    config.warmup and config.convergence_tolerance are not supported (ValueError), nor are the event and transmission
+    traces.
+    """
+    if config is None:
+        config = Config()
+        config.sim_time = Config.sim_time  # the class attribute is the global default
+    if warmup >= config.sim_time:
+        raise ValueError("warm-up ({} s) must be shorter than the run ({} s)".format(warmup, config.sim_time))
+    if config.warmup or config.convergence_tolerance is not None:
+        raise ValueError("run_branched takes its warm-up as an argument and runs every variant until sim_time "
+                         "(config.warmup and config.convergence_tolerance are not supported)")
+    if config.trace or config.debug or config.transmission_trace_path is not None:
+        raise ValueError("run_branched does not trace its runs (config.trace, debug, transmission_trace_path)")
+    for variant in variants:
+        for field in variant:
+            if not hasattr(ConfigGNB, field):
+                raise ValueError("ConfigGNB has no field {}".format(field))
+    configGNB = copy.deepcopy(configGNB) if configGNB is not None else ConfigGNB()
+    sync_slot_duration = configGNB.sync_slot_duration
+    if configGNB.strategy == Strategy.GCR_LBT:
+        configGNB.sync_slot_duration = configGNB.mini_slot_duration
+    configAP = copy.deepcopy(configAP) if configAP is not None else ConfigAP()
+
+    def warm_up():
+        environment_class, channel_class, _, _ = backend_classes(config)
+        env = environment_class()
+        channel = channel_class(env, config)
+        network_configGNB = copy.deepcopy(configGNB)
+        gnb_list, ap_list = create_nodes(env, channel, num_of_gnb, num_of_ap, seed, config, network_configGNB,
+                                         copy.deepcopy(configAP))
+        env.run(until=warmup * 1e6)
+        return env, network_configGNB, gnb_list, ap_list
+
+    def finish(network, variant):
+        env, network_configGNB, gnb_list, ap_list = network
+        for field, value in variant.items():
+            setattr(network_configGNB, field, value)  # the gNBs share it
+        if 'strategy' in variant and 'sync_slot_duration' not in variant:
+            network_configGNB.sync_slot_duration = (network_configGNB.mini_slot_duration
+                                                    if network_configGNB.strategy == Strategy.GCR_LBT
+                                                    else sync_slot_duration)
+        reset_statistics(gnb_list + ap_list)
+        env.run(until=config.sim_time * 1e6)
+        return node_results(gnb_list, ap_list, config.sim_time - warmup, config)
+
+    if not hasattr(os, 'fork'):
+        return [finish(warm_up(), variant) for variant in variants]
+
+    network = warm_up()
+    processes = processes if processes is not None else (config.num_processes or os.cpu_count() or 1)
+    results = [None] * len(variants)
+    running = dict()  # pid: (variant index, read end of its pipe)
+    pending = list(enumerate(variants))
+    while pending or running:
+        while pending and len(running) < processes:
+            index, variant = pending.pop(0)
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:  # child: continue the snapshot and send the results back
+                os.close(read_fd)
+                status = 0
+                try:
+                    outcome = ('ok', finish(network, variant))
+                except BaseException as e:
+                    outcome = ('error', "{}: {}".format(type(e).__name__, e))
+                    status = 1
+                with os.fdopen(write_fd, 'wb') as pipe:
+                    pickle.dump(outcome, pipe)
+                os._exit(status)
+            os.close(write_fd)
+            running[pid] = (index, read_fd)
+        pid = next(iter(running))
+        index, read_fd = running.pop(pid)
+        with os.fdopen(read_fd, 'rb') as pipe:
+            data = pipe.read()
+        os.waitpid(pid, 0)
+        status, value = pickle.loads(data) if data else ('error', 'child exited without results')
+        if status != 'ok':
+            raise RuntimeError("variant {} failed: {}".format(variants[index], value))
+        results[index] = value
     return results
 
 
 def process_results(results, seed, num_of_gnb, num_of_ap, filename, thi=None, num_cr_slots=None,
-                    switch_mode_periodicity=None, switch_mode_threshold=None, initial_det_backoff_value=None):
+                    switch_mode_periodicity=None, switch_mode_threshold=None, initial_det_backoff_value=None, dump=True,
+                    sink=None, tag=None, configGNB=None, labels=None):
+    """
+    configGNB: configuration the run used (default ConfigGNB()), reported in the parameter columns
+    labels: extra parameter columns (e.g. the scenario grid values of the run)
+    """
     total_airtime_gnb = 0
     trans_total_gnb = 0
     fail_total_gnb = 0
@@ -106,7 +351,7 @@ def process_results(results, seed, num_of_gnb, num_of_ap, filename, thi=None, nu
     succ_airtime_ap = 0
     trans_delay_ap = 0
 
-    configGNB = ConfigGNB()
+    configGNB = configGNB if configGNB is not None else ConfigGNB()
     per_gnb_airtime = {}
     per_ap_airtime = {}
     per_gnb_delay = {}
@@ -143,6 +388,7 @@ def process_results(results, seed, num_of_gnb, num_of_ap, filename, thi=None, nu
             j = j + 1
 
     now = time.localtime()
+    sim_time = results[0].get('sim_time', Config.sim_time) if results else Config.sim_time
 
     sum_sq_ap = 0
     sum_sq_gnb = 0
@@ -156,6 +402,17 @@ def process_results(results, seed, num_of_gnb, num_of_ap, filename, thi=None, nu
     jfi_gnb = (succ_airtime_gnb ** 2) / (Config.max_num_gnb * sum_sq_gnb) if Config.max_num_gnb != 0 else 0
     jfi_total = ((succ_airtime_gnb + succ_airtime_ap) ** 2) / (2 * (succ_airtime_gnb ** 2 + succ_airtime_ap ** 2))
 
+    queue_totals = {}
+    for node_type in ('gnb', 'ap'):
+        typed = [res for res in results if res['type'] == node_type]
+        arrivals = sum(res.get('arrivals', 0) for res in typed)
+        drops = sum(res.get('queue_drops', 0) for res in typed)
+        delays = [res['queue_delay'] for res in typed if not math.isnan(res.get('queue_delay', math.nan))]
+        queue_totals['arrivals_' + node_type] = arrivals
+        queue_totals['queue_drops_' + node_type] = drops
+        queue_totals['drop_rate_' + node_type] = drops / arrivals if arrivals > 0 else 0
+        queue_totals['queue_delay_' + node_type] = sum(delays) / len(delays) if delays else math.nan
+
     ret = {
         "time": time.strftime("%H:%M:%S", now),
         "fail_total_gnb": fail_total_gnb,
@@ -164,14 +421,14 @@ def process_results(results, seed, num_of_gnb, num_of_ap, filename, thi=None, nu
         "succ_total_ap": succ_total_ap,
         "trans_total_gnb": trans_total_gnb,
         "trans_total_ap": trans_total_ap,
-        "throughput_gnb": (succ_total_gnb * Config.data_size * 8) / (Config.sim_time * 1e6),
-        "throughput_ap": (succ_total_ap * Config.data_size * 8) / (Config.sim_time * 1e6),
+        "throughput_gnb": (succ_total_gnb * Config.data_size * 8) / (sim_time * 1e6),
+        "throughput_ap": (succ_total_ap * Config.data_size * 8) / (sim_time * 1e6),
         "total_airtime_gnb": total_airtime_gnb,
         "total_airtime_ap": total_airtime_ap,
         "collision_percent_gnb": fail_total_gnb / trans_total_gnb if (num_of_gnb != 0 and trans_total_gnb != 0) else 0,
         "collision_percent_ap": fail_total_ap / trans_total_ap if (num_of_ap != 0 and trans_total_ap != 0) else 0,
-        "efficiency_gnb": succ_airtime_gnb / (Config.sim_time * 1e6),
-        "efficiency_ap": succ_airtime_ap / (Config.sim_time * 1e6),
+        "efficiency_gnb": succ_airtime_gnb / (sim_time * 1e6),
+        "efficiency_ap": succ_airtime_ap / (sim_time * 1e6),
         "trans_delay_ap": trans_delay_ap,
         "trans_delay_gnb": trans_delay_gnb,
         "trans_delay_total": trans_delay_ap + trans_delay_gnb,
@@ -179,6 +436,14 @@ def process_results(results, seed, num_of_gnb, num_of_ap, filename, thi=None, nu
         "jfi_gnb": jfi_gnb,
         "jfi_total": jfi_total
     }
+    ret.update(queue_totals)
+
+    summary = dict(ret)
+    per_node = list()
+    for res in results:
+        type_airtime = total_airtime_gnb if res['type'] == 'gnb' else total_airtime_ap
+        per_node.append((res['type'], res['id'], res['total_airtime'] / type_airtime if type_airtime else 0,
+                         res['trans_delay']))
 
     for i in range(len(per_gnb_airtime)):
         per_gnb_airtime["norm_gnb_{}_airtime".format(i)] = per_gnb_airtime["norm_gnb_{}_airtime".format(i)] / total_airtime_gnb
@@ -191,7 +456,7 @@ def process_results(results, seed, num_of_gnb, num_of_ap, filename, thi=None, nu
     ret.update(per_ap_airtime)
     ret.update(per_ap_delay)
 
-    parameters = {'sim_time': Config.sim_time,
+    parameters = {'sim_time': sim_time,
                   'seed': seed,
                   'num_gnbs': num_of_gnb,
                   'num_aps': num_of_ap,
@@ -208,8 +473,13 @@ def process_results(results, seed, num_of_gnb, num_of_ap, filename, thi=None, nu
                   'mcot': configGNB.priority_class_values.mcot,
                   'sync': configGNB.sync_slot_duration,
                   'partial': configGNB.partial_ending_subframes}
+    if labels:
+        parameters.update(labels)
 
-    dump_csv(parameters, ret, filename + '.csv')
+    if dump and sink is not None:
+        sink.add(parameters, summary, per_node, tag)
+    elif dump:
+        dump_csv(parameters, ret, filename + '.csv')
     return ret
 
 
@@ -260,73 +530,262 @@ def log_results(sim_results, start_time, end_time, processed):
     print("--- Simulation ran for %s seconds ---" % (end_time - start_time))
 
 
-def network_performance_vs_num_gnb(num_gnb_list, num_ap, equal_num_nodes=False):
-    method = ConfigGNB.gap_type if ConfigGNB.strategy == Strategy.GAP_PERIOD else ConfigGNB.strategy
-    for num_gnb in num_gnb_list:
-        sl = []
-        for _ in range(10):
-            sl.append(random.randint(10, 1000))
-
-        print("SEEDS: ", sl)
-        for s in sl:
-            print('seed #{} - #ap/gnb: {}/{}'.format(s, num_gnb, num_gnb))
-            st = time.time()
-            sr = run_simulation(num_gnb, num_gnb if equal_num_nodes else num_ap, s)
-            et = time.time()
-            p = process_results(sr, s, num_gnb, num_gnb if equal_num_nodes else num_ap,
-                                f"network_performance_vs_num_{'gnb-ap' if equal_num_nodes else 'gnb'}_{method}")
+@dataclass()
+class SweepJob:
+    """One independent (parameter point, seed) simulation of a sweep"""
+    num_of_gnb: int
+    num_of_ap: int
+    seed: int
+    filename: str
+    thi: float = None
+    num_cr_slots: int = None
+    switch_mode_periodicity: int = None
+    switch_mode_threshold: int = None
+    initial_det_backoff_value: int = None
+    config: Config = None  # configurations of the run (default: the module defaults)
+    configGNB: ConfigGNB = None
+    configAP: ConfigAP = None
+    labels: dict = None  # extra parameter columns of the result row
+
+
+# relative simulation cost per node and simulated second (CR-slot strategies process ~2.3x more events)
+STRATEGY_COST = {Strategy.CR_LBT: 2.3, Strategy.ECR_LBT: 2.3, Strategy.GCR_LBT: 2.3}
+
+
+def job_cost(job):
+    """Expected relative wall time of a job: grows with simulated time, node count and the strategy's event rate"""
+    sim_time = job.config.sim_time if job.config is not None else Config.sim_time
+    strategy = (job.configGNB if job.configGNB is not None else ConfigGNB()).strategy
+    nodes = job.num_of_gnb * STRATEGY_COST.get(strategy, 1) + job.num_of_ap
+    return sim_time * (2 + nodes)  # a couple of nodes worth of fixed cost per run
+
+
+def simulate_job(job):
+    """Worker entry point: runs a single sweep job and returns its raw results with wall-clock timestamps"""
+    start_time = time.time()
+    sim_results = run_simulation(job.num_of_gnb, job.num_of_ap, job.seed, None, job.thi, job.num_cr_slots,
+                                 job.switch_mode_periodicity, job.switch_mode_threshold, job.initial_det_backoff_value,
+                                 configGNB=job.configGNB, configAP=job.configAP, config=job.config)
+    return sim_results, start_time, time.time()
+
+
+def simulate_indexed_job(indexed_job):
+    index, job = indexed_job
+    return index, simulate_job(job)
+
+
+def job_key(job):
+    return scenario_key(job.num_of_gnb, job.num_of_ap, job.seed, configGNB=job.configGNB, configAP=job.configAP,
+                        config=job.config, thi=job.thi, num_cr_slots=job.num_cr_slots,
+                        switch_mode_periodicity=job.switch_mode_periodicity,
+                        switch_mode_threshold=job.switch_mode_threshold,
+                        initial_det_backoff_value=job.initial_det_backoff_value)
+
+
+def record_written_rows(cache, sink, filename):
+    """Marks the rows a columnar sink has flushed as written, buffered rows are not (they are redone on resume)"""
+    if sink is None:
+        return
+    if cache is not None:
+        for key in sink.written:
+            cache.add_row(key, filename)
+    sink.written = list()
+
+
+def check_sweep_config(config):
+    """
+    Rejects the per-run output files of a sweep job's Config: every run of the sweep would write (and the workers
+    memory-map) the same file, and the runs found in the result cache would write none.
+    """
+    if config is None:
+        return
+    if config.transmission_trace_path is not None:
+        raise ValueError("a sweep can not record a transmission trace (transmission_trace_path={}), record single "
+                         "runs with run_simulation".format(config.transmission_trace_path))
+    if config.trace_path is not None and (config.trace or config.debug):
+        raise ValueError("a sweep can not write an event trace (trace_path={}), trace single runs with "
+                         "run_simulation".format(config.trace_path))
+
+
+def run_sweep(jobs, processes=None, cache_path=None):
+    """
+    Runs independent simulation jobs on a pool of worker processes.
+    Every run is seeded by its job only, so results match a serial run. Workers just simulate; the parent
+    processes the results and records them in job order, one row per job (buffered columnar parts in
+    results/<filename>/ or CSV rows in results/<filename>.csv, see Config.results_format).
+    Jobs already stored in the result cache are not simulated again, and rows already written for them are
+    not repeated, so an interrupted or extended sweep resumes where it stopped.
+    Workers take the missing jobs most expensive first (see job_cost), so long runs do not end up as the tail.
+    :param jobs: list of SweepJob
+    :param processes: number of worker processes (defaults to Config.num_processes, 1 runs serially in-process)
+    :param cache_path: result cache file (defaults to Config.cache_path, None disables the cache)
+    """
+    for job in jobs:
+        check_sweep_config(job.config)
+    processes = processes if processes is not None else Config.num_processes
+    cache_path = cache_path if cache_path is not None else Config.cache_path
+    cache = ResultCache(cache_path) if cache_path is not None else None
+    keys = [job_key(job) for job in jobs] if cache is not None else [None] * len(jobs)
+    cached = [cache.get(key) if cache is not None else None for key in keys]
+    missing = [job for job, sr in zip(jobs, cached) if sr is None]
+    print("{} of {} jobs found in the result cache".format(len(jobs) - len(missing), len(jobs)))
+
+    pool = Pool(processes) if processes != 1 and missing else None
+    if pool is not None:
+        schedule = sorted(enumerate(missing), key=lambda indexed_job: -job_cost(indexed_job[1]))
+        finished = pool.imap_unordered(simulate_indexed_job, schedule)
+    else:
+        finished = map(simulate_indexed_job, enumerate(missing))
+    outcomes = dict()  # results of missing jobs by index, until the parent reaches them
+    next_missing = 0
+
+    sinks = dict()  # one buffered columnar sink per result set (npz format only)
+    processed = list()
+    try:
+        for job, key, sr in zip(jobs, keys, cached):
+            if sr is None:
+                while next_missing not in outcomes:
+                    index, outcome = next(finished)
+                    outcomes[index] = outcome
+                sr, st, et = outcomes.pop(next_missing)
+                next_missing += 1
+                if cache is not None:
+                    cache.put(key, sr)
+            else:
+                st = et = time.time()
+            dump = cache is None or not cache.has_row(key, job.filename)
+            print('seed #{} - #gnb/ap: {}/{}'.format(job.seed, job.num_of_gnb, job.num_of_ap))
+            if Config.results_format == 'npz' and job.filename not in sinks:
+                sinks[job.filename] = ColumnarSink('results/' + job.filename, Config.results_flush_rows)
+            sink = sinks.get(job.filename)
+            p = process_results(sr, job.seed, job.num_of_gnb, job.num_of_ap, job.filename, job.thi, job.num_cr_slots,
+                                job.switch_mode_periodicity, job.switch_mode_threshold, job.initial_det_backoff_value,
+                                dump, sink, key, job.configGNB, job.labels)
+            if dump and cache is not None and sink is None:
+                cache.add_row(key, job.filename)
+            record_written_rows(cache, sink, job.filename)
             log_results(sr, st, et, p)
+            processed.append(p)
+    finally:
+        for filename, sink in sinks.items():
+            sink.close()
+            record_written_rows(cache, sink, filename)
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if cache is not None:
+            cache.close()
+    return processed
+
+
+def point_entropy(point):
+    """Hash of what a parameter point simulates (SweepJob fields but the seed, filename and labels), as an int"""
+    description = {field.name: describe(getattr(point, field.name)) for field in dataclasses.fields(point)
+                   if field.name not in ('seed', 'filename', 'labels')}
+    return int(hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()[:16], 16)
+
+
+def sweep_seeds(base_seed, point, count):
+    """
+    First count seeds of a parameter point, derived from base_seed and the point's parameters only: a rerun of the
+    sweep draws the same seeds for every point, also after points were added or reordered, so it finds its finished
+    runs in the result cache
+    """
+    state = numpy.random.SeedSequence([base_seed, point_entropy(point)]).generate_state(count)
+    return [10 + int(s) % (2 ** 31 - 10) for s in state]
+
+
+def ci_target(mean):
+    return max(Config.ci_relative_width * abs(mean), Config.ci_absolute_width) if math.isfinite(mean) else math.inf
+
+
+def run_adaptive(points, processes=None, base_seed=0):
+    """
+    Runs every parameter point (a SweepJob whose seed is ignored) with its own seeds (sweep_seeds of base_seed and the
+    point's parameters) until the CI half-width of each Config.ci_metrics is within its target, using between
+    Config.min_seeds and Config.max_seeds seeds per point.
+    Seeds are added in rounds (sized from the current variance, at most doubling a point) and all unfinished points
+    of a round share one sweep. The point estimates and CIs are appended to results/<filename>_ci.csv.
+    """
+    seeds = [[] for _ in points]
+    samples = [{metric: [] for metric in Config.ci_metrics} for _ in points]
+    pending = {i: Config.min_seeds for i in range(len(points))}
+    while pending:
+        jobs = []
+        owners = []
+        for i, count in pending.items():
+            sl = sweep_seeds(base_seed, points[i], len(seeds[i]) + count)[len(seeds[i]):]
+            print("SEEDS: ", sl)
+            seeds[i] += sl
+            for s in sl:
+                jobs.append(dataclasses.replace(points[i], seed=s))
+                owners.append(i)
+        for i, p in zip(owners, run_sweep(jobs, processes)):
+            for metric in Config.ci_metrics:
+                samples[i][metric].append(p[metric])
+
+        pending = {}
+        for i in sorted(set(owners)):
+            needed = len(seeds[i])
+            for metric in Config.ci_metrics:
+                mean, half_width, n = confidence_interval(samples[i][metric], Config.ci_level)
+                needed = max(needed, required_samples(samples[i][metric], ci_target(mean), Config.ci_level))
+            needed = min(needed, Config.max_seeds, 2 * len(seeds[i]))
+            if needed > len(seeds[i]):
+                pending[i] = needed - len(seeds[i])
+
+    estimates = []
+    for point, point_seeds, point_samples in zip(points, seeds, samples):
+        parameters = {field.name: getattr(point, field.name) for field in dataclasses.fields(point)
+                      if field.name not in ('seed', 'filename', 'config', 'configGNB', 'configAP', 'labels')}
+        parameters.update(point.labels or {})
+        parameters['num_seeds'] = len(point_seeds)
+        parameters['ci_level'] = Config.ci_level
+        ci = {}
+        for metric in Config.ci_metrics:
+            mean, half_width, n = confidence_interval(point_samples[metric], Config.ci_level)
+            ci[metric] = mean
+            ci[metric + '_ci'] = half_width
+            ci[metric + '_converged'] = half_width <= ci_target(mean)
+        print("{}: {} seeds, {}".format(point.filename, len(point_seeds),
+                                        ", ".join("{} = {:.4g} +- {:.2g}".format(m, ci[m], ci[m + '_ci']) for m in Config.ci_metrics)))
+        dump_csv(parameters, ci, point.filename + '_ci.csv')
+        estimates.append(ci)
+    print("{} runs for {} parameter points".format(sum(len(sl) for sl in seeds), len(points)))
+    return estimates
+
+
+def network_performance_vs_num_gnb(num_gnb_list, num_ap, equal_num_nodes=False, processes=None, base_seed=0):
+    method = ConfigGNB.gap_type if ConfigGNB.strategy == Strategy.GAP_PERIOD else ConfigGNB.strategy
+    points = [SweepJob(num_gnb, num_gnb if equal_num_nodes else num_ap, None,
+                       f"network_performance_vs_num_{'gnb-ap' if equal_num_nodes else 'gnb'}_{method}")
+              for num_gnb in num_gnb_list]
+    run_adaptive(points, processes, base_seed)
 
 
-def nru_efficiency_vs_thi(num_gnb, num_ap):
+def nru_efficiency_vs_thi(num_gnb, num_ap, processes=None, base_seed=0):
     thi_list = [i/10 for i in range(0, 11)]
-    for thi in thi_list:
-        sl = []
-        for _ in range(10):
-            sl.append(random.randint(10, 1000))
-        print("SEEDS: ", sl)
-        for s in sl:
-            st = time.time()
-            sr = run_simulation(num_gnb, num_ap, s, None, thi)
-            et = time.time()
-            p = process_results(sr, s, num_gnb, num_ap, f"nru_efficiency_vs_thi", thi)
-            log_results(sr, st, et, p)
+    run_adaptive([SweepJob(num_gnb, num_ap, None, f"nru_efficiency_vs_thi", thi) for thi in thi_list], processes,
+                 base_seed)
 
 
-def per_node_performance_cdf(num_gnb, num_ap):
+def per_node_performance_cdf(num_gnb, num_ap, processes=None, base_seed=0):
     method = ConfigGNB.gap_type if ConfigGNB.strategy == Strategy.GAP_PERIOD else ConfigGNB.strategy
-    sl = []
-    for _ in range(10):
-        sl.append(random.randint(10, 1000))
+    run_adaptive([SweepJob(num_gnb, num_ap, None, f"per_node_performance_cdf_{method}")], processes, base_seed)
 
-    print("SEEDS: ", sl)
-    for s in sl:
-        st = time.time()
-        sr = run_simulation(num_gnb, num_ap, s)
-        et = time.time()
-        p = process_results(sr, s, num_gnb, num_ap, f"per_node_performance_cdf_{method}")
-        log_results(sr, st, et, p)
 
-
-def network_performance_vs_num_gnb_DB_LBT(num_gnb_list, num_ap, equal_num_nodes=False):
+def network_performance_vs_num_gnb_DB_LBT(num_gnb_list, num_ap, equal_num_nodes=False, processes=None, base_seed=0):
     switch_mode_periodicity = [4, 7, 10]
     switch_mode_threshold = [3, 5, 8]
     initial_det_backoff_value = [11, 16, 21]
 
+    points = []
     for num_gnb in num_gnb_list:
         for i in range(3):
-            sl = []
-            for _ in range(10):
-                sl.append(random.randint(10, 1000))
-            print("SEEDS: ", sl)
-            for s in sl:
-                st = time.time()
-                sr = run_simulation(num_gnb, num_gnb if equal_num_nodes else num_ap, s, None, None, None,
-                                    switch_mode_periodicity[i], switch_mode_threshold[i], initial_det_backoff_value[i])
-                et = time.time()
-                p = process_results(sr, s, num_gnb, num_gnb if equal_num_nodes else num_ap, "network_performance_db_lbt", None, None,
-                                    switch_mode_periodicity[i], switch_mode_threshold[i], initial_det_backoff_value[i])
-                log_results(sr, st, et, p)
+            points.append(SweepJob(num_gnb, num_gnb if equal_num_nodes else num_ap, None, "network_performance_db_lbt",
+                                   None, None, switch_mode_periodicity[i], switch_mode_threshold[i],
+                                   initial_det_backoff_value[i]))
+    run_adaptive(points, processes, base_seed)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,110 @@
+import glob
+import os
+import numpy
+
+NODE_COLUMNS = ('row', 'type', 'id', 'airtime', 'delay')  # long form per-node table (row = index of the run in its part)
+
+
+def _column(values):
+    """Typed array for a column: numbers (None as NaN) stay numeric, everything else (enums, labels) becomes text"""
+    if all(v is None or isinstance(v, (bool, int, float, numpy.number)) for v in values):
+        if all(isinstance(v, (bool, numpy.bool_)) for v in values):
+            return numpy.asarray(values, dtype=bool)
+        if all(isinstance(v, (int, numpy.integer)) and not isinstance(v, bool) for v in values):
+            return numpy.asarray(values, dtype=numpy.int64)
+        return numpy.asarray([numpy.nan if v is None else v for v in values], dtype=numpy.float64)
+    return numpy.asarray([str(v) for v in values])
+
+
+class ColumnarSink(object):
+    """
+    Buffers processed runs in memory and flushes them in batches to compressed .npz part files of a dataset
+    directory: one typed array per run-level column, plus a long (row, type, id) table for the per-node values.
+    """
+
+    def __init__(self, directory, flush_rows=1000):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self.rows = list()
+        self.nodes = list()
+        self.tags = list()
+        self.written = list()  # tags of the buffered rows that have reached disk, for the caller to collect
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, parameters, summary, per_node, tag=None):
+        """
+        :param parameters: run parameters (seed, node counts, strategy, ...)
+        :param summary: run-level metrics from process_results
+        :param per_node: list of (type, id, normalized airtime, delay) tuples
+        :param tag: opaque run identifier moved to self.written once the row is flushed
+        """
+        row = dict(summary)
+        row.update(parameters)
+        for node in per_node:
+            self.nodes.append((len(self.rows),) + tuple(node))
+        self.rows.append(row)
+        self.tags.append(tag)
+        if len(self.rows) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        arrays = {}
+        for name in self.rows[0]:
+            arrays[name] = _column([row.get(name) for row in self.rows])
+        if self.nodes:
+            for i, name in enumerate(NODE_COLUMNS):
+                arrays['node_' + name] = _column([node[i] for node in self.nodes])
+        with self._new_part() as part_file:
+            numpy.savez_compressed(part_file, **arrays)
+        self.rows = list()
+        self.nodes = list()
+        self.written.extend(self.tags)
+        self.tags = list()
+
+    def _new_part(self):
+        """
+        Creates the next free part file. The create is exclusive, so a part is never overwritten: another sweep writing
+        the dataset or a deleted earlier part only moves the numbering on.
+        """
+        part = len(glob.glob(os.path.join(self.directory, 'part-*.npz')))
+        while True:
+            try:
+                return open(os.path.join(self.directory, 'part-{:05d}.npz'.format(part)), 'xb')
+            except FileExistsError:
+                part += 1
+
+    def close(self):
+        self.flush()
+
+
+def load_results(directory):
+    """
+    Loads every part of a dataset directory, every part must have the same columns (ValueError otherwise).
+    Returns (runs, nodes): dicts of concatenated column arrays, node 'row' indexes into the runs arrays.
+    """
+    runs = {}
+    nodes = {}
+    offset = 0
+    columns = None
+    for path in sorted(glob.glob(os.path.join(directory, 'part-*.npz'))):
+        with numpy.load(path) as part:
+            if columns is None:
+                columns = set(part.files)
+            elif set(part.files) != columns:
+                raise ValueError("{} does not have the columns of the other parts (missing: {}, extra: {})".format(
+                    path, ', '.join(sorted(columns - set(part.files))) or '-',
+                    ', '.join(sorted(set(part.files) - columns)) or '-'))
+            num_rows = None
+            for name in part.files:
+                if name.startswith('node_'):
+                    values = part[name] + offset if name == 'node_row' else part[name]
+                    nodes.setdefault(name[len('node_'):], []).append(values)
+                else:
+                    runs.setdefault(name, []).append(part[name])
+                    num_rows = len(part[name])
+            offset += num_rows or 0
+    runs = {name: numpy.concatenate(parts) for name, parts in runs.items()}
+    nodes = {name: numpy.concatenate(parts) for name, parts in nodes.items()}
+    return runs, nodes
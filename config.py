@@ -51,17 +51,52 @@ class PriorityClassValues(object):
 @dataclass()
 class Config:
     sim_time: int = 10
-    debug: bool = False
+    debug: bool = False  # trace every node and print the trace after each run
+    trace: bool = False  # record node events in a ring buffer (see tracing.Tracer)
+    trace_capacity: int = 100000  # records kept
+    trace_nodes: tuple = None  # (node type, id) pairs traced, e.g. (('gnb', 0),) (None = all)
+    trace_events: tuple = None  # TraceEvent names traced (None = all)
+    trace_path: str = None  # file a run's trace is written to (None prints it), single runs only (not in sweeps)
+    profile_phases: bool = False  # merge per-node MAC phase counters and timers into the results (see profiling.py)
+    transmission_trace_path: str = None  # binary file every transmission of a run is recorded to (see txtrace.py),
+    # single runs only (not in sweeps)
     observation_slot_duration: int = 9  # microseconds
+    sense_mode: str = "event"  # 'event' (channel busy/idle events) or 'interrupt' (interrupt every sensing process)
+    backoff_countdown: str = "single"  # 'single' (one timeout per countdown) or 'per_slot' (one timeout per observation slot)
+    backend: str = "simpy"  # 'simpy' (a SimPy process per MAC phase) or 'callback' (node state machines, see eventcore.py)
+    variate_block_size: int = 1024  # uniforms pre-drawn at once per node random stream (does not change results)
     cca_tx_switch_time: int = 0
     data_size: int = 1472  # size of payload
     max_num_gnb: int = 20
     max_num_ap: int = 20
     fairness_tolerance_rate: int = 0.2
+    num_processes: int = None  # worker processes used by parameter sweeps (None = one per core, 1 = serial)
+    cache_path: str = "results/cache.sqlite"  # result store reused by sweeps (None = always simulate)
+    results_format: str = "npz"  # 'npz' (buffered columnar parts in results/<name>/) or 'csv' (one appended row per run)
+    results_flush_rows: int = 1000  # runs buffered in memory before a columnar part is written
+    # adaptive replications: seeds are added to a parameter point until every target metric reaches its CI width
+    min_seeds: int = 5
+    max_seeds: int = 50
+    ci_level: float = 0.95
+    ci_metrics: tuple = ('efficiency_gnb', 'efficiency_ap', 'jfi_total', 'trans_delay_gnb', 'trans_delay_ap')
+    ci_relative_width: float = 0.05  # target CI half-width relative to the mean
+    ci_absolute_width: float = 0.005  # ... or absolute (for metrics close to zero)
+    # early stop: a run ends once the batch means of the successful airtime and transmissions of each node type are this
+    # precise (CI half-width relative to the batch mean), None always runs for sim_time
+    convergence_tolerance: float = None
+    convergence_batch: float = 0.1  # seconds
+    convergence_min_batches: int = 10
+    # warm-up deletion: seconds at the start of a run left out of the results, or 'mser' to find the warm-up with the
+    # MSER-5 rule over warmup_interval observations of the successful airtime (runs for sim_time, not with the early stop)
+    warmup: float = 0
+    warmup_interval: float = 0.01  # seconds
 
 @dataclass()
 class ConfigGNB:
-    poisson_lambda: int = None  # int = 10
+    poisson_lambda: int = None  # frame arrivals per ms of the 'poisson' traffic
+    traffic: str = None  # 'saturated', 'poisson' or 'trace' (None = 'poisson' if poisson_lambda is set, else 'saturated')
+    traffic_trace: str = None  # arrival times (us) of the 'trace' traffic, see traffic.py
+    queue_size: int = 64  # frames a node holds, arrivals to a full queue are dropped
     strategy: Strategy = Strategy.GCR_LBT
     gap_type: Gap = Gap.AFTER_WITH_CCA
     deter_period: int = 16  # Time which a node is required to wait at the start of prioritization period (us)
@@ -143,7 +178,10 @@ class ConfigGNB:
 
 @dataclass()
 class ConfigAP:
-    poisson_lambda: int = None  # int = 10
+    poisson_lambda: int = None  # frame arrivals per ms of the 'poisson' traffic
+    traffic: str = None  # 'saturated', 'poisson' or 'trace' (None = 'poisson' if poisson_lambda is set, else 'saturated')
+    traffic_trace: str = None  # arrival times (us) of the 'trace' traffic, see traffic.py
+    queue_size: int = 64  # frames a node holds, arrivals to a full queue are dropped
     cw_min: int = 15  # min cw window size
     cw_max: int = 63  # max cw window size
     r_limit: int = 7
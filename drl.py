@@ -0,0 +1,223 @@
+"""
+Gym-style environment for DRL agents: every step retunes the gNB configuration in place, advances the simulation by
+one decision epoch and observes what the nodes achieved during it.
+
+    env = CoexistenceEnv(4, 4, action_fields=('prob_rs_next_slots', 'num_cr_slots'))
+    observation, info = env.reset(seed=1)
+    observation, reward, terminated, truncated, info = env.step([0.3, 4])
+
+The API follows Gymnasium (reset returns (observation, info), step returns a 5-tuple). When gymnasium is installed
+the environment is a gymnasium.Env with Box observation and action spaces. VectorCoexistenceEnv steps N environments
+in worker processes at once.
+"""
+
+import copy
+from multiprocessing import Pipe, Process
+
+import numpy
+
+from coexistence import backend_classes, create_nodes
+from config import Config, ConfigGNB, ConfigAP, Strategy
+
+try:
+    import gymnasium
+    from gymnasium import spaces
+except ImportError:  # the environments work without gymnasium, they only lack the space descriptions
+    gymnasium = None
+
+# per epoch: successful airtime share of the epoch, collided share of the transmissions and mean channel access delay
+# (ms) of each node type
+OBSERVATIONS = ('efficiency_gnb', 'efficiency_ap', 'collision_gnb', 'collision_ap', 'delay_gnb', 'delay_ap')
+# ConfigGNB fields an action may set, with their bounds
+ACTION_BOUNDS = {'prob_rs_first_slot': (0.0, 1.0),
+                 'prob_rs_next_slots': (0.0, 1.0),
+                 'num_cr_slots': (1, 16),
+                 'switch_mode_periodicity': (1, 64),
+                 'switch_mode_threshold': (0, 64),
+                 'initial_det_backoff_value': (0, 128)}
+INTEGER_FIELDS = {'num_cr_slots', 'switch_mode_periodicity', 'switch_mode_threshold', 'initial_det_backoff_value'}
+
+
+def default_reward(observation):
+    """Total efficiency of the epoch weighted by the Jain's fairness index of the two node types"""
+    efficiency_gnb, efficiency_ap = observation[0], observation[1]
+    total = efficiency_gnb + efficiency_ap
+    if total == 0:
+        return 0.0
+    return float(total * total ** 2 / (2 * (efficiency_gnb ** 2 + efficiency_ap ** 2)))
+
+
+class CoexistenceEnv(gymnasium.Env if gymnasium is not None else object):
+    metadata = {'render_modes': []}
+
+    def __init__(self, num_of_gnb, num_of_ap, configGNB=None, configAP=None, config=None, epoch=0.01,
+                 episode_epochs=100, action_fields=('prob_rs_next_slots',), reward=default_reward, seed_stride=1):
+        """
+        :param epoch: simulated seconds per step
+        :param episode_epochs: steps per episode (the last one is truncated)
+        :param action_fields: ConfigGNB fields set by an action, in the order of the action vector
+        :param reward: function of the observation vector
+        :param seed_stride: seed step between episodes reset without a seed
+        """
+        for field in action_fields:
+            if field not in ACTION_BOUNDS:
+                raise ValueError("{} is not a tunable ConfigGNB field ({})".format(field, ', '.join(ACTION_BOUNDS)))
+        self.num_of_gnb = num_of_gnb
+        self.num_of_ap = num_of_ap
+        self.base_configGNB = configGNB if configGNB is not None else ConfigGNB()
+        self.base_configAP = configAP if configAP is not None else ConfigAP()
+        self.config = config if config is not None else Config()
+        self.epoch = epoch
+        self.episode_epochs = episode_epochs
+        self.action_fields = tuple(action_fields)
+        self.reward = reward
+        self.seed_stride = seed_stride
+        self.episode_seed = None
+        self.env = None
+        if gymnasium is not None:
+            low = numpy.array([ACTION_BOUNDS[field][0] for field in self.action_fields], dtype=numpy.float32)
+            high = numpy.array([ACTION_BOUNDS[field][1] for field in self.action_fields], dtype=numpy.float32)
+            self.action_space = spaces.Box(low, high, dtype=numpy.float32)
+            self.observation_space = spaces.Box(0, numpy.inf, (len(OBSERVATIONS),), dtype=numpy.float32)
+
+    def reset(self, seed=None, options=None):
+        """
+        Starts a new episode on a fresh network (the configurations are copied from the base ones again).
+        Without a seed an episode uses the previous episode's seed + seed_stride.
+        """
+        if seed is not None:
+            self.episode_seed = seed
+        elif self.episode_seed is not None:
+            self.episode_seed += self.seed_stride
+        else:
+            self.episode_seed = int(numpy.random.SeedSequence().generate_state(1)[0])
+        environment_class, channel_class, _, _ = backend_classes(self.config)
+        self.env = environment_class()
+        self.configGNB = copy.deepcopy(self.base_configGNB)
+        if self.configGNB.strategy == Strategy.GCR_LBT:
+            self.configGNB.sync_slot_duration = self.configGNB.mini_slot_duration
+        self.configAP = copy.deepcopy(self.base_configAP)
+        channel = channel_class(self.env, self.config)
+        self.gnb_list, self.ap_list = create_nodes(self.env, channel, self.num_of_gnb, self.num_of_ap,
+                                                   self.episode_seed, self.config, self.configGNB, self.configAP)
+        self.steps = 0
+        self.counters = self._counters()
+        observation = numpy.zeros(len(OBSERVATIONS), dtype=numpy.float32)
+        return observation, self._info(observation)
+
+    def apply_action(self, action):
+        """Sets the action's ConfigGNB fields (a dict or a sequence ordered as action_fields) on every gNB"""
+        values = action.items() if isinstance(action, dict) else zip(self.action_fields, numpy.ravel(action))
+        for field, value in values:
+            low, high = ACTION_BOUNDS[field]
+            value = min(max(float(value), low), high)
+            setattr(self.configGNB, field, int(round(value)) if field in INTEGER_FIELDS else value)
+
+    def step(self, action):
+        if self.env is None:
+            raise RuntimeError("reset() must be called before step()")
+        if action is not None:
+            self.apply_action(action)
+        self.env.run(until=self.env.now + self.epoch * 1e6)
+        counters = self._counters()
+        observation = self._observation(counters - self.counters)
+        self.counters = counters
+        self.steps += 1
+        truncated = self.steps >= self.episode_epochs
+        return observation, self.reward(observation), False, truncated, self._info(observation)
+
+    def _counters(self):
+        """(node type, [successful airtime, transmissions, successful transmissions, access delay]) totals"""
+        return numpy.array([[sum(node.successful_airtime for node in nodes),
+                             sum(node.total_trans for node in nodes),
+                             sum(node.successful_trans for node in nodes),
+                             sum(node.transmission_delay for node in nodes)]
+                            for nodes in (self.gnb_list, self.ap_list)], dtype=float)
+
+    def _observation(self, delta):
+        airtime, trans, succ, delay = delta.T
+        efficiency = airtime / (self.epoch * 1e6)
+        collision = numpy.divide(trans - succ, trans, out=numpy.zeros(2), where=trans > 0)
+        access_delay = numpy.divide(delay, succ * 1e3, out=numpy.zeros(2), where=succ > 0)
+        return numpy.array([efficiency[0], efficiency[1], collision[0], collision[1], access_delay[0], access_delay[1]],
+                           dtype=numpy.float32)
+
+    def _info(self, observation):
+        info = dict(zip(OBSERVATIONS, observation.tolist()))
+        info['sim_time'] = self.env.now / 1e6
+        info['seed'] = self.episode_seed
+        return info
+
+
+def _worker(connection, kwargs):
+    env = CoexistenceEnv(**kwargs)
+    try:
+        while True:
+            command, data = connection.recv()
+            if command == 'reset':
+                connection.send(env.reset(seed=data))
+            elif command == 'step':
+                observation, reward, terminated, truncated, info = env.step(data)
+                if terminated or truncated:  # autoreset, the last observation of the episode goes to info
+                    info['final_observation'] = observation
+                    observation, _ = env.reset()
+                connection.send((observation, reward, terminated, truncated, info))
+            elif command == 'close':
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        connection.close()
+
+
+class VectorCoexistenceEnv(object):
+    """
+    num_envs CoexistenceEnv in worker processes, stepped together: step sends every worker its action before
+    collecting any result, so the environments simulate their epochs in parallel.
+    Finished episodes are reset right away (their last observation is in info['final_observation']).
+    """
+
+    def __init__(self, num_envs, **kwargs):
+        """:param kwargs: CoexistenceEnv arguments (the same for every environment, seeds do not overlap)"""
+        self.num_envs = num_envs
+        self.connections = list()
+        self.processes = list()
+        for _ in range(num_envs):
+            parent, child = Pipe()
+            process = Process(target=_worker, args=(child, dict(kwargs, seed_stride=num_envs)), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        self.closed = False
+
+    def reset(self, seed=None):
+        """Resets every environment, environment i gets seed + i"""
+        for i, connection in enumerate(self.connections):
+            connection.send(('reset', None if seed is None else seed + i))
+        observations, infos = zip(*[connection.recv() for connection in self.connections])
+        return numpy.stack(observations), list(infos)
+
+    def step(self, actions):
+        """actions: one action per environment (rows of an array or a list of dicts)"""
+        for connection, action in zip(self.connections, actions):
+            connection.send(('step', action))
+        observations, rewards, terminated, truncated, infos = zip(*[c.recv() for c in self.connections])
+        return (numpy.stack(observations), numpy.array(rewards), numpy.array(terminated), numpy.array(truncated),
+                list(infos))
+
+    def close(self):
+        if self.closed:
+            return
+        for connection in self.connections:
+            connection.send(('close', None))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
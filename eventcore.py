@@ -0,0 +1,592 @@
+"""
+Callback-based discrete-event core, the 'callback' backend of run_simulation (Config.backend).
+Instead of a SimPy process per MAC phase, every node is an explicit state machine: each state is a method that runs
+when the timer or channel notification the node waits on fires and then arms the next one.
+ - EventLoop: heap of cancellable timers ordered by (time, scheduling order), with the now / run(until) of a SimPy
+   Environment, so run_simulation, run_branched and the DRL environment drive both backends the same way,
+ - CallbackChannel: the Channel bookkeeping, a transmission start calls back the nodes counting down or sensing
+   (their timers are cancelled) and the channel becoming free calls back the nodes waiting for it,
+ - CallbackGnB / CallbackAp: the GnB / Ap procedures as state machines (they reuse the nodes' counters, backoff
+   drawing, frame generation and traffic queue), every strategy and traffic mode included. An AP with a frozen
+   backoff sleeps through the DIFS polls that would find the channel busy instead of waking up at each one.
+Channel sensing is always event-driven (sense_mode and backoff_countdown only select SimPy implementations), and phase
+profiling is not available. Events at the same time may run in a different order than with SimPy, so runs of the
+two backends agree statistically, not seed by seed (see compare_with_simpy, run for every strategy by
+`python checks.py callback`).
+"""
+
+import heapq
+import math
+import time
+from itertools import count
+
+import numpy
+
+from ap import Ap
+from channel import Channel, SLOT_EPSILON, observed_slots
+from gnb import GnB, TransmissionGNB
+from stats import welch_t
+from tracing import TraceEvent
+from txtrace import KIND_DATA, KIND_RS
+
+
+class Timer(object):
+    __slots__ = ('callback',)
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def cancel(self):
+        """The timer will not fire (no effect once it has fired)"""
+        self.callback = None
+
+
+class EventLoop(object):
+    def __init__(self, initial_time=0):
+        self.now = initial_time
+        self.timers_fired = 0
+        self._queue = list()  # heap of (time, sequence number, timer)
+        self._sequence = count()
+
+    def call_at(self, when, callback):
+        """Calls callback() at time when, returns its Timer"""
+        timer = Timer(callback)
+        heapq.heappush(self._queue, (when, next(self._sequence), timer))
+        return timer
+
+    def call_later(self, delay, callback):
+        return self.call_at(self.now + delay, callback)
+
+    def run(self, until=None):
+        """Fires the timers due before until (all of them by default), then moves the clock to until"""
+        until = math.inf if until is None else until
+        if until < self.now:
+            raise ValueError("until (={}) must not be before the current time (={})".format(until, self.now))
+        queue = self._queue
+        pop = heapq.heappop
+        fired = 0
+        while queue and queue[0][0] < until:
+            self.now, _, timer = pop(queue)
+            callback = timer.callback
+            if callback is not None:
+                fired += 1
+                callback()
+        self.timers_fired += fired
+        if until != math.inf:
+            self.now = until
+
+
+class Countdown(object):
+    """Countdown of slots_to_wait observation slots, reports callback(slots_left, interrupted)"""
+    __slots__ = ('channel', 'callback', 'start_time', 'slots_to_wait', 'timer')
+
+    def __init__(self, channel, slots_to_wait, callback):
+        self.channel = channel
+        self.callback = callback
+        self.start_time = channel.env.now
+        self.slots_to_wait = slots_to_wait
+        self.timer = channel.env.call_later(slots_to_wait * channel.config.observation_slot_duration, self.expire)
+
+    def expire(self):
+        self.timer = None
+        self.callback(0, False)
+
+    def interrupt(self):
+        self.timer.cancel()
+        self.timer = None
+        elapsed = self.channel.env.now - self.start_time
+        slots_left = self.slots_to_wait - observed_slots(elapsed, self.channel.config.observation_slot_duration,
+                                                         self.slots_to_wait)
+        self.callback(slots_left, slots_left > 0)
+
+
+class SensePeriod(object):
+    """Sensing for a fixed duration, reports callback(sensed_idle)"""
+    __slots__ = ('channel', 'callback', 'start_time', 'duration', 'timer')
+
+    def __init__(self, channel, duration, callback):
+        self.channel = channel
+        self.callback = callback
+        self.start_time = channel.env.now
+        self.duration = duration
+        self.timer = channel.env.call_later(duration, self.expire)
+
+    def expire(self):
+        self.timer = None
+        self.callback(True)
+
+    def interrupt(self):
+        self.timer.cancel()
+        self.timer = None
+        self.callback(self.channel.env.now - self.start_time >= self.duration - SLOT_EPSILON)
+
+
+class CallbackChannel(Channel):
+    def __init__(self, env, config):
+        self.env = env
+        self.config = config
+        self.sense_mode = config.sense_mode
+        self.ongoing_transmissions = dict()
+        self.ongoing_senses = list()
+        self.bytes_sent = 0
+        self.sensing = list()  # Countdown / SensePeriod to interrupt at the next transmission start (or expired)
+        self.idle_waiters = list()  # callbacks of the nodes waiting for the channel to become free
+        self._busy_until = list()
+        self._seq = 0
+
+    def remove_transmission(self, transmission):
+        del self.ongoing_transmissions[transmission]
+        if self.idle_waiters and self.time_until_free() == 0:
+            waiters, self.idle_waiters = self.idle_waiters, list()
+            for callback in waiters:
+                callback()
+
+    def notify_busy(self):
+        if self.sensing:
+            sensing, self.sensing = self.sensing, list()
+            for sense in sensing:
+                if sense.timer is not None:
+                    sense.interrupt()
+
+    def free_time(self):
+        """Time the ongoing transmissions end (now when the channel is free)"""
+        if self.time_until_free() == 0:
+            return self.env.now
+        return -self._busy_until[0][0]
+
+    def when_idle(self, callback):
+        """Calls callback() once the channel becomes free"""
+        self.idle_waiters.append(callback)
+
+    def count_down(self, slots_to_wait, callback):
+        """Counts down observation slots while the channel stays idle, then calls callback(slots_left, interrupted)"""
+        if slots_to_wait <= 0:
+            callback(slots_to_wait, False)
+        else:
+            self.sensing.append(Countdown(self, slots_to_wait, callback))
+
+    def sense_for(self, duration, callback):
+        """Senses the channel for a fixed period, then calls callback(sensed_idle)"""
+        if self.time_until_free() > 0:
+            callback(False)
+        else:
+            self.sensing.append(SensePeriod(self, duration, callback))
+
+
+class CallbackGnB(GnB):
+    """GnB whose procedure (GnB.run) runs as a state machine on an EventLoop"""
+
+    def __init__(self, env, nid, config, configGNB, channel, desync, strategy, gap, tracer=None, recorder=None,
+                 streams=None):
+        if config.profile_phases:
+            raise ValueError("the callback backend does not profile MAC phases")
+        super().__init__(env, nid, config, configGNB, channel, desync, strategy, gap, tracer, recorder, streams)
+
+    def start(self):
+        self.env.call_later(0, self.next_frame)
+
+    def next_frame(self):
+        if not self.queue.start_service(self.env.now):
+            next_arrival = self.queue.next_arrival()
+            if next_arrival != math.inf:  # else trace traffic ended
+                self.env.call_at(next_arrival, self.next_frame)
+            return
+        self.trace(TraceEvent.PROCEDURE_START)
+        self.was_sent = False
+        self.procedure_access = self.access
+        self.draw_backoff()
+
+    def draw_backoff(self):
+        self.N = self.generate_new_back_off_value()
+        self.trace(TraceEvent.BACKOFF_DRAWN, self.N)
+        self.contend()
+
+    def contend(self):
+        self.trace(TraceEvent.PRIORITIZATION_START)
+        self.m = self.configGNB.priority_class_values.m
+        self.prioritize()
+
+    # prioritization period (wait_prioritization_period)
+
+    def prioritize(self):
+        if self.m <= 0:
+            self.prioritized()
+            return
+        waiting_time = self.channel.time_until_free()
+        if waiting_time != 0:
+            self.trace(TraceEvent.CHANNEL_BUSY, waiting_time)
+            self.channel.when_idle(self.prioritize)
+            return
+        self.trace(TraceEvent.DEFER_START, self.m, self.configGNB.deter_period)
+        self.env.call_later(self.configGNB.deter_period, self.deferred)
+
+    def deferred(self):
+        if self.channel.time_until_free() > 0:
+            self.trace(TraceEvent.DEFER_BUSY)
+            self.prioritize()
+            return
+        self.trace(TraceEvent.DEFER_IDLE, self.configGNB.priority_class_values.m)
+        self.channel.count_down(self.configGNB.priority_class_values.m, self.prioritization_sensed)
+
+    def prioritization_sensed(self, slots_left, interrupted):
+        self.m = slots_left
+        if slots_left != 0:
+            self.trace(TraceEvent.PRIORITIZATION_FAILED)
+        self.prioritize()
+
+    def prioritized(self):
+        self.trace(TraceEvent.PRIORITIZATION_END)
+        if self.procedure_access.gap_before_backoff:
+            self.gap_period(self.gap_before_done)
+        else:
+            self.gap_before_done()
+
+    def gap_before_done(self):
+        if not self.procedure_access.backoff_in_gap:  # else the backoff was done inside the gap period
+            self.trace(TraceEvent.BACKOFF_START, self.N)
+            if self.N == 0 and self.procedure_access.abort_busy_zero_backoff and self.channel.time_until_free() > 0:
+                self.trace(TraceEvent.BACKOFF_ABORTED)
+                self.contend()
+                return
+            self.random_backoff(self.backoff_done)
+        else:
+            self.backoff_done()
+
+    def backoff_done(self):
+        if self.N != 0:
+            self.trace(TraceEvent.BACKOFF_FROZEN, self.N)
+            self.contend()
+        elif self.procedure_access.cr_slots:
+            self.cr_slots()
+        elif self.procedure_access.gap_after_backoff:
+            self.gap_period(self.gap_after_done)
+        else:
+            self.gap_after_done()
+
+    def gap_after_done(self):
+        if self.procedure_access.cca_after_gap and self.channel.time_until_free() > 0:
+            self.trace(TraceEvent.GAP_BUSY)
+            self.draw_backoff()
+        else:
+            self.ready()
+
+    # gap period (wait_gap_period), calls then() at its end
+
+    def gap_period(self, then):
+        backoff_time = self.N * self.config.observation_slot_duration
+        gap_length = self.next_sync_slot_boundary - self.env.now - backoff_time
+        while gap_length < 0:
+            gap_length += self.config.observation_slot_duration
+        self.trace(TraceEvent.GAP_START, gap_length)
+        self.gap_then = then
+        if not self.procedure_access.backoff_in_gap:
+            self.env.call_later(gap_length, then)
+        else:
+            self.trace(TraceEvent.GAP_FIRST_HALF, gap_length / 2)
+            self.gap_half = gap_length / 2
+            self.env.call_later(self.gap_half, self.gap_backoff)
+
+    def gap_backoff(self):
+        self.trace(TraceEvent.GAP_BACKOFF, self.N)
+        self.random_backoff(self.gap_backoff_done)
+
+    def gap_backoff_done(self):
+        if self.N == 0:
+            self.trace(TraceEvent.GAP_SECOND_HALF, self.gap_half)
+            self.env.call_later(self.gap_half, self.gap_then)
+        else:
+            self.gap_then()
+
+    # backoff (wait_random_backoff), calls then() with the counter updated
+
+    def random_backoff(self, then):
+        self.backoff_then = then
+        if self.channel.time_until_free() > 0:
+            then()
+            return
+        if not self.procedure_access.split_backoff:
+            self.channel.count_down(self.N, self.backoff_sensed)
+            return
+        if self.configGNB.backoff_slot_split == 'fixed':
+            backoff_slots_left = self.configGNB.backoff_slots_to_leave
+        elif self.configGNB.backoff_slot_split == 'variable':
+            backoff_slots_left = int(math.ceil(self.configGNB.backoff_slots_to_leave * self.N))
+        else:
+            backoff_slots_left = 0
+        self.split_slots = max(self.N - backoff_slots_left, 0)
+        self.trace(TraceEvent.SPLIT_BACKOFF, self.split_slots)
+        self.channel.count_down(self.split_slots, self.split_sensed)
+
+    def backoff_sensed(self, slots_left, interrupted):
+        if interrupted:
+            self.backoff_interrupt_counter += 1
+        self.N = slots_left
+        self.backoff_then()
+
+    def split_sensed(self, slots_left, interrupted):
+        if interrupted:
+            self.backoff_interrupt_counter += 1
+        if slots_left == 0:
+            self.trace(TraceEvent.SPLIT_GAP)
+            self.gap_period(self.split_resume)
+        else:
+            self.N = slots_left + self.N - self.split_slots
+            self.backoff_then()
+
+    def split_resume(self):
+        self.trace(TraceEvent.SPLIT_RESUME, self.N - self.split_slots)
+        if self.channel.time_until_free() > 0:
+            self.N = self.N - self.split_slots
+            self.backoff_then()
+        else:
+            self.channel.count_down(self.N - self.split_slots, self.backoff_sensed)
+
+    # contention resolution slots (wait_cr_slots)
+
+    def cr_slots(self):
+        self.cr_slots_left = self.procedure_access.cr_slot_count(self.next_sync_slot_boundary - self.env.now)
+        self.trace(TraceEvent.CR_SLOTS_START, self.cr_slots_left)
+        self.performing_cr_lbt = True
+        self.first_cr_slot = True
+        self.cr_slot()
+
+    def cr_slot(self):
+        if self.cr_slots_left > 0:
+            self.trace(TraceEvent.CR_RS_START, self.cr_slots_left, self.configGNB.t_cr_reserve)
+            self.send_rs_signal(self.configGNB.t_cr_reserve, self.cr_reserved)
+        else:
+            self.send_rs_signal(self.next_sync_slot_boundary - self.env.now, self.cr_slots_reserved)
+
+    def cr_reserved(self):
+        self.trace(TraceEvent.CR_RS_END, self.cr_slots_left)
+        p = self.procedure_access.prob_rs_first_slot() if self.first_cr_slot else self.configGNB.prob_rs_next_slots
+        t_cr_remain = self.configGNB.t_cr_slot - self.configGNB.t_cr_reserve
+        action = 'rs' if self.cr_action_rng.random() < p else 'sense'
+        self.trace(TraceEvent.CR_ACTION, self.cr_slots_left, action, t_cr_remain)
+        if action == 'rs':
+            self.send_rs_signal(t_cr_remain, self.cr_slot_done)
+        else:
+            self.channel.sense_for(t_cr_remain, self.cr_sensed)
+
+    def cr_sensed(self, sensed_idle):
+        if sensed_idle:
+            self.cr_slot_done()
+        else:
+            self.cr_slots_done()
+
+    def cr_slot_done(self):
+        self.cr_slots_left -= 1
+        self.first_cr_slot = False
+        self.cr_slot()
+
+    def cr_slots_reserved(self):
+        self.performing_cr_lbt = False
+        self.cr_slots_done()
+
+    def cr_slots_done(self):
+        if self.cr_slots_left > 0 and self.performing_cr_lbt:
+            self.failed_transmissions_in_row += 1
+            self.performing_cr_lbt = False
+            self.cr_skip = self.next_sync_slot_boundary - self.env.now
+        self.ready()
+
+    def send_rs_signal(self, duration, then):
+        rs_transmission = TransmissionGNB.acquire(self.env.now, duration, 0)
+        self.channel.add_transmission(rs_transmission)
+        self.channel.notify_busy()
+        self.rs_transmission = rs_transmission
+        self.rs_then = then
+        self.env.call_at(rs_transmission.end_time, self.rs_signal_sent)
+
+    def rs_signal_sent(self):
+        rs_transmission = self.rs_transmission
+        self.channel.remove_transmission(rs_transmission)
+        self.record(rs_transmission, KIND_RS)
+        rs_transmission.release()
+        self.rs_then()
+
+    # transmission
+
+    def ready(self):
+        if self.cr_skip:
+            self.cr_skip = None
+            self.trace(TraceEvent.CR_ABORTED)
+            self.env.call_at(self.next_sync_slot_boundary, self.draw_backoff)
+        elif (self.configGNB.skip_next_slot_boundary and self.skip == self.env.now) or (self.configGNB.skip_next_txop and self.skip):
+            self.skip = None
+            self.trace(TraceEvent.SLOT_SKIPPED, self.configGNB.sync_slot_duration)
+            self.env.call_later(self.configGNB.sync_slot_duration, self.draw_backoff)
+        else:
+            self.env.call_later(self.config.cca_tx_switch_time, self.transmit)  # switching from sensing to TX
+
+    def transmit(self):
+        transmission = self.transmission_to_send = self.generate_new_transmission()
+        self.trace(TraceEvent.TX_START, transmission.end_time - transmission.start_time)
+        self.channel.add_transmission(transmission)
+        self.channel.notify_busy()
+        self.env.call_at(transmission.end_time, self.transmitted)
+
+    def transmitted(self):
+        transmission = self.transmission_to_send
+        self.channel.check_collision(transmission)
+        self.channel.remove_transmission(transmission)
+        self.record(transmission, KIND_DATA)
+        self.was_sent = not transmission.collided
+        self.trace(TraceEvent.TX_END)
+
+        if self.was_sent:
+            self.trace(TraceEvent.TX_SUCCESS, self.configGNB.priority_class_values.cw_min)
+            self.successful_trans += 1
+            self.successful_airtime += transmission.airtime_duration
+            self.transmission_delay += transmission.start_time - self.last_succ_trans_end_time
+            self.last_succ_trans_end_time = transmission.end_time
+            self.failed_transmissions_in_row = 0
+            if self.configGNB.skip_next_slot_boundary or self.configGNB.skip_next_txop:
+                self.skip = self.next_sync_slot_boundary
+        else:
+            self.failed_transmissions_in_row += 1
+            if transmission.number_of_retransmissions > self.configGNB.retry_limit:
+                self.transmission_to_send = self.generate_new_transmission()
+                self.failed_transmissions_in_row = 0
+            self.trace(TraceEvent.TX_COLLISION)
+
+        self.total_trans += 1
+        self.total_airtime += self.transmission_to_send.airtime_duration
+        if self.was_sent:
+            self.queue.finish_service(self.env.now)
+            self.next_frame()
+        else:
+            self.draw_backoff()
+
+
+class CallbackAp(Ap):
+    """Ap whose procedure (Ap.run) runs as a state machine on an EventLoop"""
+
+    def __init__(self, env, nid, config, configAP, channel, tracer=None, recorder=None, streams=None):
+        if config.profile_phases:
+            raise ValueError("the callback backend does not profile MAC phases")
+        super().__init__(env, nid, config, configAP, channel, tracer, recorder, streams)
+
+    def start(self):
+        self.env.call_later(0, self.next_frame)
+
+    def next_frame(self):
+        if not self.queue.start_service(self.env.now):
+            next_arrival = self.queue.next_arrival()
+            if next_arrival != math.inf:  # else trace traffic ended
+                self.env.call_at(next_arrival, self.next_frame)
+            return
+        self.trace(TraceEvent.PROCEDURE_START)
+        self.was_sent = False
+        self.draw_backoff()
+
+    def draw_backoff(self):
+        self.N = self.generate_new_back_off_value()
+        self.trace(TraceEvent.BACKOFF_DRAWN, self.N)
+        self.contend()
+
+    def contend(self):
+        self.trace(TraceEvent.BACKOFF_START, self.N)
+        self.env.call_later(self.times.DIFSTime, self.random_backoff)
+
+    def random_backoff(self):
+        if self.channel.time_until_free() == 0:
+            self.channel.count_down(self.N, self.backoff_sensed)
+        elif self.N == 0:
+            self.backoff_done()
+        else:  # sleeps through the DIFS polls that would find the channel busy
+            self.trace(TraceEvent.BACKOFF_FROZEN, self.N)
+            self.trace(TraceEvent.BACKOFF_START, self.N)
+            free_time = self.channel.free_time()
+            poll_time = self.env.now + self.times.DIFSTime
+            while poll_time < free_time:
+                poll_time += self.times.DIFSTime
+            self.env.call_at(poll_time, self.random_backoff)
+
+    def backoff_sensed(self, slots_left, interrupted):
+        if interrupted:
+            self.backoff_interrupt_counter += 1
+        self.N = slots_left
+        self.backoff_done()
+
+    def backoff_done(self):
+        if self.N == 0:
+            self.trace(TraceEvent.BACKOFF_END, self.config.cca_tx_switch_time)
+            self.env.call_later(self.config.cca_tx_switch_time, self.transmit)  # switching from sensing to TX
+        else:
+            self.trace(TraceEvent.BACKOFF_FROZEN, self.N)
+            self.contend()
+
+    def transmit(self):
+        frame = self.frame_to_send = self.generate_new_frame()
+        self.trace(TraceEvent.TX_START, frame.airtime_duration)
+        self.channel.add_transmission(frame)
+        self.channel.notify_busy()
+        self.env.call_at(frame.end_time, self.transmitted)
+
+    def transmitted(self):
+        frame = self.frame_to_send
+        self.channel.check_collision(frame)
+        self.channel.remove_transmission(frame)
+        self.record(frame, KIND_DATA)
+        self.was_sent = not frame.collided
+        self.trace(TraceEvent.TX_END)
+        if self.was_sent:
+            self.env.call_later(self.times.get_ack_frame_time(), self.acknowledged)
+        else:
+            self.failed_transmissions_in_row += 1
+            self.env.call_later(self.times.ack_timeout, self.ack_timed_out)
+
+    def acknowledged(self):
+        frame = self.frame_to_send
+        self.trace(TraceEvent.TX_SUCCESS, self.configAP.cw_min)
+        self.successful_trans += 1
+        self.successful_airtime += frame.airtime_duration
+        self.failed_transmissions_in_row = 0
+        self.transmission_delay += frame.start_time - self.last_succ_trans_end_time
+        self.last_succ_trans_end_time = frame.end_time
+        self.channel.bytes_sent += frame.data_size
+        self.total_trans += 1
+        self.total_airtime += frame.airtime_duration
+        self.queue.finish_service(self.env.now)
+        self.next_frame()
+
+    def ack_timed_out(self):
+        if self.frame_to_send.number_of_retransmissions > self.configAP.retry_limit:
+            self.frame_to_send = self.generate_new_frame()
+            self.failed_transmissions_in_row = 0
+        self.trace(TraceEvent.TX_COLLISION)
+        self.total_trans += 1
+        self.total_airtime += self.frame_to_send.airtime_duration
+        self.draw_backoff()
+
+
+def compare_with_simpy(num_of_gnb, num_of_ap, seeds, configGNB=None, configAP=None, config=None):
+    """
+    Statistical equivalence check of the callback backend against the SimPy one over the same seeds.
+    Prints the mean of every per-type metric for both backends with Welch's t statistic, and the wall time of each
+    backend, and returns the t statistics (|t| well below 2 everywhere means the backends agree).
+    """
+    import copy
+    from coexistence import run_simulation
+    from config import Config
+
+    base = config if config is not None else Config()
+    runs = dict()
+    for backend in ('callback', 'simpy'):
+        backend_config = copy.deepcopy(base)
+        backend_config.backend = backend
+        start = time.perf_counter()
+        runs[backend] = [run_simulation(num_of_gnb, num_of_ap, s, configGNB=configGNB, configAP=configAP,
+                                        config=backend_config) for s in seeds]
+        print("{}: {:.2f} s".format(backend, time.perf_counter() - start))
+
+    t_stats = {}
+    for node_type in ('gnb', 'ap'):
+        for metric in ('succ_trans', 'total_trans', 'succ_airtime', 'total_airtime'):
+            a, b = [numpy.array([sum(res[metric] for res in run if res['type'] == node_type) for run in runs[backend]])
+                    for backend in ('callback', 'simpy')]
+            t = welch_t(a, b)
+            t_stats["{}_{}".format(metric, node_type)] = t
+            print("{}_{}: callback {:.2f} | simpy {:.2f} | t = {:.2f}".format(metric, node_type, a.mean(), b.mean(), t))
+    return t_stats
@@ -0,0 +1,92 @@
+from time import perf_counter
+
+from simpy.events import Condition, Timeout
+
+# MAC phases of the gNB and AP state machines, each one is a SimPy process of the node
+PHASES = ('procedure', 'prioritization', 'idle_wait', 'backoff', 'sensing', 'gap', 'cr_slots', 'transmit', 'ack')
+
+
+def no_phase(phase, generator):
+    """Phase wrapper of nodes that are not profiled"""
+    return generator
+
+
+class PhaseProfile(object):
+    """
+    Per-node counters and timers of the MAC phases: calls, simulated time spent in the phase (us) and wall time spent
+    executing the phase's own generator (s), plus the timeouts it waited on, the interrupts the node received while
+    sensing and the sensing processes it spawned (the 'sensing' calls). Phases still running when the report is made
+    (GnB.run / Ap.run, the 'procedure' phase, never end) count up to the current simulation time.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.sim_time = dict.fromkeys(PHASES, 0)
+        self.wall_time = dict.fromkeys(PHASES, 0)
+        self.timeouts = dict.fromkeys(PHASES, 0)
+        self.interrupts = 0
+        self.running = dict.fromkeys(PHASES, 0)  # phase instances started but not ended
+        self.running_starts = dict.fromkeys(PHASES, 0)  # sum of their start times
+
+    def wrap(self, phase, generator):
+        """Process generator that runs generator and accounts it to phase"""
+        self.calls[phase] += 1
+        return self._profiled(phase, generator)
+
+    def _profiled(self, phase, generator):
+        start = self.env.now
+        self.running[phase] += 1
+        self.running_starts[phase] += start
+        value = None
+        error = None
+        try:
+            while True:
+                resumed = perf_counter()
+                try:
+                    event = generator.send(value) if error is None else generator.throw(error)
+                except StopIteration as stop:
+                    return stop.value
+                finally:
+                    self.wall_time[phase] += perf_counter() - resumed
+                if isinstance(event, (Timeout, Condition)):  # conditions here always race a timeout
+                    self.timeouts[phase] += 1
+                value = error = None
+                try:
+                    value = yield event
+                except BaseException as e:  # interrupts are delivered to the phase
+                    error = e
+        finally:
+            self.running[phase] -= 1
+            self.running_starts[phase] -= start
+            self.sim_time[phase] += self.env.now - start
+
+    def add(self, phase, sim_time):
+        """Accounts a plain wait of the node's own process (no separate generator) to phase"""
+        self.calls[phase] += 1
+        self.sim_time[phase] += sim_time
+        self.timeouts[phase] += 1
+
+    def report(self):
+        """Flat dict merged into the node's run_simulation results"""
+        report = {'profile_interrupts': self.interrupts,
+                  'profile_sensing_processes': self.calls['sensing'],
+                  'profile_timeouts': sum(self.timeouts.values())}
+        for phase in PHASES:
+            report['profile_{}_calls'.format(phase)] = self.calls[phase]
+            report['profile_{}_sim_time'.format(phase)] = (self.sim_time[phase] + self.running[phase] * self.env.now
+                                                           - self.running_starts[phase])
+            report['profile_{}_wall_time'.format(phase)] = self.wall_time[phase]
+            report['profile_{}_timeouts'.format(phase)] = self.timeouts[phase]
+        return report
+
+
+def phase_summary(results):
+    """Totals of the profile counters of run_simulation results per node type"""
+    summary = dict()
+    for res in results:
+        totals = summary.setdefault(res['type'], dict())
+        for key, value in res.items():
+            if key.startswith('profile_'):
+                totals[key] = totals.get(key, 0) + value
+    return summary
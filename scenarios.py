@@ -0,0 +1,145 @@
+"""
+Declarative parameter sweeps. A scenario file (JSON, YAML or TOML) declares a cartesian grid over node counts and
+any Config / ConfigGNB / ConfigAP field, plus the seeds of every grid point:
+
+    name: db_lbt_grid                        # result set (results/<name>)
+    seeds: 10                                # seeds 1..10 of every point, a list of seeds, or "adaptive"
+    base_seed: 0                             # seeds of the "adaptive" points are derived from it (see sweep_seeds)
+    equal_num_nodes: false                   # true: num_of_ap follows num_of_gnb
+    grid:
+      num_of_gnb: [1, 2, 4, 8]
+      num_of_ap: [4]
+      Config.sim_time: [1]
+      ConfigGNB.strategy: [DB_LBT]
+      # comma-separated fields vary together (zipped) instead of being crossed
+      ConfigGNB.switch_mode_periodicity,ConfigGNB.switch_mode_threshold: [[4, 3], [7, 5], [10, 8]]
+
+    python scenarios.py scenarios/db_lbt_grid.yaml [--processes N]
+
+Fields missing from the grid keep their defaults. Enum fields take member names. The grid values are label columns of
+every row, so a scenario needs a result set of its own (load_results rejects parts with other columns).
+The seeds of a scenario are fixed by its file, so running it again after an interruption finds the finished runs in
+the result cache and only simulates the rest.
+"""
+
+import argparse
+import itertools
+import json
+import os
+from enum import Enum
+
+from coexistence import SweepJob, run_adaptive, run_sweep
+from config import Config, ConfigGNB, ConfigAP, PriorityClassValues
+
+CONFIG_CLASSES = {'Config': Config, 'ConfigGNB': ConfigGNB, 'ConfigAP': ConfigAP}
+NODE_FIELDS = ('num_of_gnb', 'num_of_ap')
+
+
+def load_scenario(path):
+    """Reads a scenario file, the format follows the extension (.json, .yaml/.yml, .toml)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.json':
+        with open(path) as scenario_file:
+            return json.load(scenario_file)
+    if extension in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("YAML scenario files need PyYAML (pip install pyyaml)")
+        with open(path) as scenario_file:
+            return yaml.safe_load(scenario_file)
+    if extension == '.toml':
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ImportError("TOML scenario files need Python 3.11+ or tomli (pip install tomli)")
+        with open(path, 'rb') as scenario_file:
+            return tomllib.load(scenario_file)
+    raise ValueError("unknown scenario file format: {}".format(path))
+
+
+def set_field(config, field, value):
+    """Sets a configuration field from a scenario value (enum members by name)"""
+    if not hasattr(config, field):
+        raise ValueError("{} has no field {}".format(type(config).__name__, field))
+    current = getattr(config, field)
+    if isinstance(current, Enum) and not isinstance(value, Enum):
+        value = type(current)[value]
+    setattr(config, field, value)
+    if isinstance(config, ConfigGNB) and field == 'priority_class':
+        config.priority_class_values = PriorityClassValues(value)
+
+
+def grid_points(grid):
+    """Expands a grid into a list of {field: value} dicts (comma-separated keys are zipped axes)"""
+    axes = list()
+    for key, values in grid.items():
+        fields = [field.strip() for field in key.split(',')]
+        if len(fields) == 1:
+            axes.append([{fields[0]: value} for value in values])
+        else:
+            for value in values:
+                if len(value) != len(fields):
+                    raise ValueError("{} needs {} values per entry, got {}".format(key, len(fields), value))
+            axes.append([dict(zip(fields, value)) for value in values])
+    points = list()
+    for combination in itertools.product(*axes):
+        point = dict()
+        for values in combination:
+            point.update(values)
+        points.append(point)
+    return points
+
+
+def scenario_jobs(scenario, seeds=None):
+    """
+    Jobs of every grid point of a scenario, seed left None when seeds is None.
+    Returns a list of SweepJob with the grid values of their point as result labels.
+    """
+    name = scenario['name']
+    jobs = list()
+    for point in grid_points(scenario.get('grid', {})):
+        configs = {class_name: cls() for class_name, cls in CONFIG_CLASSES.items()}
+        configs['Config'].sim_time = Config.sim_time  # the class attribute is the global default
+        nodes = {'num_of_gnb': 0, 'num_of_ap': 0}
+        for key, value in point.items():
+            if key in NODE_FIELDS:
+                nodes[key] = value
+                continue
+            class_name, _, field = key.partition('.')
+            if class_name not in CONFIG_CLASSES or not field:
+                raise ValueError("unknown scenario field {} (expected num_of_gnb, num_of_ap or "
+                                 "Config/ConfigGNB/ConfigAP.<field>)".format(key))
+            set_field(configs[class_name], field, value)
+        if scenario.get('equal_num_nodes', False):
+            nodes['num_of_ap'] = nodes['num_of_gnb']
+        labels = {key: value for key, value in point.items() if key not in NODE_FIELDS}
+        for seed in (seeds if seeds is not None else [None]):
+            jobs.append(SweepJob(nodes['num_of_gnb'], nodes['num_of_ap'], seed, name, config=configs['Config'],
+                                 configGNB=configs['ConfigGNB'], configAP=configs['ConfigAP'],
+                                 labels=labels))
+    return jobs
+
+
+def run_scenario(scenario, processes=None):
+    """Runs a scenario (dict or file path) and returns the processed results of its jobs"""
+    if isinstance(scenario, str):
+        scenario = load_scenario(scenario)
+    seeds = scenario.get('seeds', 10)
+    if seeds == 'adaptive':
+        return run_adaptive(scenario_jobs(scenario), processes, scenario.get('base_seed', 0))
+    if isinstance(seeds, int):
+        seeds = list(range(1, seeds + 1))
+    return run_sweep(scenario_jobs(scenario, seeds), processes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="run the parameter sweep of a scenario file")
+    parser.add_argument('scenario', nargs='+', help="scenario file(s) (.json, .yaml, .toml)")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default Config.num_processes)")
+    args = parser.parse_args()
+    for path in args.scenario:
+        run_scenario(path, args.processes)
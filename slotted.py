@@ -0,0 +1,216 @@
+"""
+Vectorized engine for the slotted scenarios: Wi-Fi APs (CSMA/CA or DB-LBT) and DB-LBT gNBs.
+Every replication is a row and every node a column of the state arrays, and all replications advance together
+one busy period at a time. It mirrors the timing of the SimPy nodes:
+ - a gNB starts its backoff countdown after deter period + m observation slots of idle channel,
+ - an AP polls the channel every DIFS and starts counting down at the first poll that finds it idle,
+   an AP with a zero backoff counter transmits at the end of its DIFS whatever the channel state,
+ - nodes counting down when a transmission starts freeze their counter (observed slots are kept)
+   and increase their DB-LBT backoff interrupt counter,
+ - traffic is saturated: a node starts its next frame as soon as the previous one is delivered,
+ - a DB-LBT gNB occupies the channel for its MCOT, sending a reservation signal up to the next sync slot boundary
+   and data for the rest (only the data counts as airtime).
+"""
+
+import math
+import numpy
+
+from channel import SLOT_EPSILON
+from config import Config, ConfigGNB, ConfigAP, Strategy
+from stats import welch_t
+from times import Times, get_times
+from traffic import traffic_mode
+
+
+def _per_replication(value, default, reps):
+    """Broadcasts a scalar or per-replication sequence of a parameter to a column vector"""
+    value = default if value is None else value
+    return numpy.broadcast_to(numpy.asarray(value, dtype=float), (reps,)).reshape(reps, 1)
+
+
+def run_slotted_batch(num_of_gnb, num_of_ap, seeds, switch_mode_periodicity=None, switch_mode_threshold=None,
+                      initial_det_backoff_value=None, configGNB=None, configAP=None, config=None):
+    """
+    Simulates one replication per seed at once and returns a list with the run_simulation results of every replication.
+    The DB-LBT parameters may be scalars or sequences with one value per seed, so a batch can screen many combinations.
+    config: Config of the runs (default: Config() with the Config.sim_time class attribute), without warm-up deletion
+    or early stop
+    """
+    if config is None:
+        config = Config()
+        config.sim_time = Config.sim_time  # the class attribute is the global default
+    if config.warmup or config.convergence_tolerance is not None:
+        raise ValueError("slotted engine does not delete a warm-up or stop early")
+    configGNB = configGNB if configGNB is not None else ConfigGNB()
+    configAP = configAP if configAP is not None else ConfigAP()
+    if num_of_gnb > 0 and configGNB.strategy != Strategy.DB_LBT:
+        raise ValueError("slotted engine only models DB-LBT gNBs, got {}".format(configGNB.strategy))
+    if configGNB.partial_ending_subframes:
+        raise ValueError("slotted engine does not model partial ending subframes")
+    if traffic_mode(configGNB) != 'saturated' or traffic_mode(configAP) != 'saturated':
+        raise ValueError("slotted engine only models saturated traffic")
+
+    reps = len(seeds)
+    n = num_of_gnb + num_of_ap
+    rng = numpy.random.default_rng(numpy.random.SeedSequence(list(seeds)))
+
+    times = get_times(config.data_size, configAP.mcs, configAP.aifsn, configAP.standard, configAP.nSS)
+    slot = config.observation_slot_duration
+    difs = times.DIFSTime
+    ack_time = times.get_ack_frame_time()
+    gnb_defer = configGNB.deter_period + configGNB.priority_class_values.m * slot
+    sim_end = config.sim_time * 1e6
+
+    is_ap = numpy.arange(n) >= num_of_gnb
+    airtime = numpy.where(is_ap, times.get_ppdu_frame_time(configAP.nAMPDU), configGNB.priority_class_values.mcot * 1e3)
+    sync = configGNB.sync_slot_duration  # gNBs are not desynchronised (GnB.desync is 0)
+    db_lbt = numpy.where(is_ap, configAP.db_lbt, True)
+    period = numpy.empty((reps, n))
+    threshold = numpy.empty((reps, n))
+    det_value = numpy.empty((reps, n))
+    period[:, :num_of_gnb] = _per_replication(switch_mode_periodicity, configGNB.switch_mode_periodicity, reps)
+    threshold[:, :num_of_gnb] = _per_replication(switch_mode_threshold, configGNB.switch_mode_threshold, reps)
+    det_value[:, :num_of_gnb] = _per_replication(initial_det_backoff_value, configGNB.initial_det_backoff_value, reps)
+    period[:, num_of_gnb:] = configAP.switch_mode_periodicity
+    threshold[:, num_of_gnb:] = configAP.switch_mode_threshold
+    det_value[:, num_of_gnb:] = configAP.initial_det_backoff_value
+
+    N = numpy.zeros((reps, n))  # backoff counters
+    failed = numpy.zeros((reps, n))  # failed transmissions in row
+    counter = numpy.zeros((reps, n))  # backoff interrupt counters (i in DB-LBT)
+    avail = numpy.zeros((reps, n))  # start of the current DIFS polling chain (APs)
+    succ = numpy.zeros((reps, n))
+    total = numpy.zeros((reps, n))
+    succ_air = numpy.zeros((reps, n))
+    total_air = numpy.zeros((reps, n))
+    delay = numpy.zeros((reps, n))
+    last_succ_end = numpy.zeros((reps, n))
+
+    def draw(mask, initial=False):
+        """generate_new_back_off_value for every node in mask"""
+        u = rng.random((reps, n))
+        det = db_lbt & (failed % period < threshold) & (not initial)
+        upper = numpy.minimum(2 ** numpy.minimum(failed, 30) * (configAP.cw_min + 1) - 1, configAP.cw_max)
+        value = numpy.where(db_lbt, numpy.where(det, det_value + counter, numpy.floor(u * period)),
+                            numpy.floor(u * (upper + 1)))
+        N[mask] = value[mask]
+        counter[mask & det] = 0
+
+    def data_airtime(start):
+        """Airtime of the data of transmissions started at start (gNBs lose their reservation signal)"""
+        return numpy.where(is_ap, airtime, airtime - (sync - numpy.mod(start, sync)))
+
+    def settle_failure(mask, start):
+        end = start + airtime
+        booked = mask & (numpy.where(is_ap, end + Times.ack_timeout, end) < sim_end)
+        total[booked] += 1
+        total_air[booked] += numpy.broadcast_to(data_airtime(start), (reps, n))[booked]
+        failed[mask] += 1
+        avail[mask & is_ap] = (end + Times.ack_timeout)[mask & is_ap]
+        draw(mask)
+
+    def settle_success(mask, start):
+        end = start + airtime
+        booked = mask & (numpy.where(is_ap, end + ack_time, end) < sim_end)
+        succ[booked] += 1
+        total[booked] += 1
+        data = numpy.broadcast_to(data_airtime(start), (reps, n))
+        succ_air[booked] += data[booked]
+        total_air[booked] += data[booked]
+        delay[booked] += (start - last_succ_end)[booked]
+        last_succ_end[booked] = numpy.broadcast_to(end, (reps, n))[booked]
+        failed[mask] = 0
+        avail[mask & is_ap] = (end + ack_time)[mask & is_ap]
+        draw(mask)
+
+    draw(numpy.ones((reps, n), dtype=bool), initial=True)
+    t0 = numpy.zeros(reps)  # time the channel became idle
+    running = numpy.ones(reps, dtype=bool)
+
+    while True:
+        # when would every node transmit if nobody else did
+        polls = numpy.maximum(1, numpy.ceil((t0[:, None] - avail) / difs))
+        start = numpy.where(is_ap, avail + difs * polls, t0[:, None] + gnb_defer)
+        blind = is_ap & (N == 0)
+        finish = numpy.where(blind, avail + difs, start + slot * N)
+        t1 = finish.min(axis=1)
+        running &= t1 < sim_end
+        if not running.any():
+            break
+        live = running[:, None]
+        first = numpy.where(running, t1, 0)[:, None]
+
+        # nodes already counting down freeze their backoff
+        tx = live & (finish == first)
+        interrupted = live & ~tx & ~blind & (start <= first)
+        observed = numpy.minimum(numpy.floor((first - start) / slot + SLOT_EPSILON), N)
+        N[interrupted] -= observed[interrupted]
+        counter[interrupted] += 1
+        avail[interrupted & is_ap] = numpy.broadcast_to(first, (reps, n))[interrupted & is_ap]
+
+        # busy period: simultaneous transmitters plus APs transmitting blindly before it ends
+        n_tx = tx.sum(axis=1)
+        busy_end = numpy.where(running, t1 + numpy.where(tx, airtime, 0).max(axis=1), t0)
+        single = tx & (n_tx == 1)[:, None]
+        settle_failure(tx & (n_tx >= 2)[:, None], first)
+        while True:
+            joining = live & is_ap & ~single & (N == 0) & (avail + difs < busy_end[:, None])
+            if not joining.any():
+                break
+            join_start = avail + difs
+            n_tx += joining.sum(axis=1)
+            busy_end = numpy.maximum(busy_end, numpy.where(joining, join_start + airtime, -numpy.inf).max(axis=1))
+            collided = single & (n_tx >= 2)[:, None]
+            single &= ~collided
+            settle_failure(collided, first)
+            settle_failure(joining, join_start)
+        settle_success(single, first)
+        t0 = busy_end
+
+    results = list()
+    for r in range(reps):
+        run_results = list()
+        for i in range(n):
+            node_type = 'ap' if is_ap[i] else 'gnb'
+            run_results.append({'id': i - num_of_gnb if is_ap[i] else i,
+                                'type': node_type,
+                                'succ_trans': int(succ[r, i]),
+                                'fail_trans': int(total[r, i] - succ[r, i]),
+                                'total_trans': int(total[r, i]),
+                                'coll_percent': 1 - succ[r, i] / total[r, i] if total[r, i] > 0 else None,
+                                'total_airtime': float(total_air[r, i]),
+                                'succ_airtime': float(succ_air[r, i]),
+                                'trans_delay': delay[r, i] / succ[r, i] if succ[r, i] > 0 else math.nan,
+                                'sim_time': config.sim_time,
+                                # saturated queue: the frames sent plus the one in service at the end, never dropped
+                                # and never waiting
+                                'arrivals': int(succ[r, i]) + 1,
+                                'queue_drops': 0,
+                                'queue_delay': 0.0})
+        results.append(run_results)
+    return results
+
+
+def compare_with_simpy(num_of_gnb, num_of_ap, seeds, configGNB=None, configAP=None, config=None):
+    """
+    Statistical equivalence check of the slotted engine against run_simulation over the same seeds.
+    Prints the mean of every per-type metric for both engines with Welch's t statistic and returns the t statistics
+    (|t| well below 2 everywhere means the engines agree within the replication noise).
+    """
+    from coexistence import run_simulation
+
+    slotted_runs = run_slotted_batch(num_of_gnb, num_of_ap, seeds, configGNB=configGNB, configAP=configAP, config=config)
+    simpy_runs = [run_simulation(num_of_gnb, num_of_ap, s, configGNB=configGNB, configAP=configAP, config=config)
+                  for s in seeds]
+
+    t_stats = {}
+    for node_type in ('gnb', 'ap'):
+        for metric in ('succ_trans', 'total_trans', 'succ_airtime', 'total_airtime'):
+            samples = []
+            for runs in (slotted_runs, simpy_runs):
+                samples.append(numpy.array([sum(res[metric] for res in run if res['type'] == node_type) for run in runs]))
+            a, b = samples
+            t = welch_t(a, b)
+            t_stats["{}_{}".format(metric, node_type)] = t
+            print("{}_{}: slotted {:.2f} | simpy {:.2f} | t = {:.2f}".format(metric, node_type, a.mean(), b.mean(), t))
+    return t_stats
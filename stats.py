@@ -0,0 +1,108 @@
+import math
+from statistics import NormalDist
+
+import numpy
+
+
+def t_quantile(p, dof):
+    """Quantile of Student's t distribution (Cornish-Fisher expansion, within 1% from 2 dof)"""
+    z = NormalDist().inv_cdf(p)
+    if math.isinf(dof):
+        return z
+    return (z + (z ** 3 + z) / (4 * dof)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * dof ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * dof ** 3)
+            + (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * dof ** 4))
+
+
+def confidence_interval(samples, level=0.95):
+    """
+    Mean and CI half-width of independent samples (non-finite values are skipped).
+    Returns (mean, half_width, n), the half-width is inf with less than two samples.
+    """
+    samples = numpy.asarray(samples, dtype=float)
+    samples = samples[numpy.isfinite(samples)]
+    n = len(samples)
+    if n == 0:
+        return math.nan, math.inf, 0
+    if n == 1:
+        return float(samples[0]), math.inf, 1
+    half_width = t_quantile((1 + level) / 2, n - 1) * samples.std(ddof=1) / math.sqrt(n)
+    return float(samples.mean()), float(half_width), n
+
+
+def welch_t(a, b):
+    """Welch's t statistic of the difference between the means of two samples"""
+    a = numpy.asarray(a, dtype=float)
+    b = numpy.asarray(b, dtype=float)
+    se = math.sqrt(a.var(ddof=1) / len(a) + b.var(ddof=1) / len(b)) if len(a) > 1 and len(b) > 1 else 0
+    return (a.mean() - b.mean()) / se if se > 0 else (0.0 if a.mean() == b.mean() else math.inf)
+
+
+def required_samples(samples, target_half_width, level=0.95):
+    """Number of samples the CI of samples needs to shrink to target_half_width, from their current spread"""
+    mean, half_width, n = confidence_interval(samples, level)
+    if n < 2:
+        return n + 1
+    if half_width <= target_half_width:
+        return n
+    if target_half_width <= 0:
+        return math.inf
+    return int(math.ceil(n * (half_width / target_half_width) ** 2))
+
+
+class BatchMeans(object):
+    """
+    Batch means of cumulative per-node counters, sampled at the end of every batch of a run.
+    Samples are (nodes x counters) arrays; the batch values are the increments between samples.
+    Convergence is judged per group of nodes (the sum of their counters), every node is a group by default.
+    """
+
+    def __init__(self, initial, groups=None):
+        """:param groups: lists of node indexes whose counters are summed, e.g. the gNBs and the APs"""
+        self.samples = [numpy.array(initial, dtype=float)]
+        num_nodes = self.samples[0].shape[0]
+        self.groups = [list(group) for group in groups if len(group) > 0] if groups is not None \
+            else [[node] for node in range(num_nodes)]
+
+    def add(self, cumulative):
+        self.samples.append(numpy.array(cumulative, dtype=float))
+
+    @property
+    def num_batches(self):
+        return len(self.samples) - 1
+
+    def converged(self, tolerance, level=0.95, min_batches=10):
+        """
+        True once, with at least min_batches, the CI half-width of every group's batch mean is within tolerance times
+        that batch mean (a relative precision, whatever the number of nodes).
+        """
+        if self.num_batches < max(min_batches, 2):
+            return False
+        batches = numpy.diff(numpy.asarray(self.samples), axis=0)
+        for group in self.groups:
+            totals = batches[:, group, :].sum(axis=1)
+            for counter in range(totals.shape[1]):
+                mean, half_width, n = confidence_interval(totals[:, counter], level)
+                if half_width > tolerance * abs(mean):
+                    return False
+        return True
+
+
+def mser(series, batch_size=5):
+    """
+    MSER truncation point of a series (MSER-5 with the default batch size): the number of leading observations
+    whose deletion minimises the squared standard error of the remaining batch means, searched over the first half.
+    """
+    series = numpy.asarray(series, dtype=float)
+    num_batches = len(series) // batch_size
+    if num_batches < 2:
+        return 0
+    batches = series[:num_batches * batch_size].reshape(num_batches, batch_size).mean(axis=1)
+    best, best_d = math.inf, 0
+    for d in range(num_batches // 2 + 1):
+        kept = batches[d:]
+        statistic = ((kept - kept.mean()) ** 2).sum() / len(kept) ** 2
+        if statistic < best:
+            best, best_d = statistic, d
+    return best_d * batch_size
@@ -0,0 +1,104 @@
+"""
+Channel access behaviour of the gNB strategies. A GnB resolves its ChannelAccess with access_for and its MAC loop only
+reads the flags and calls the hooks, so a new LBT variant is a subclass registered in ACCESS_CLASSES.
+Hooks read the gNB configuration when called, so in-place changes of their parameters take effect immediately. A change
+of strategy or gap_type (or a new configuration) makes the GnB resolve a new ChannelAccess at its next use, so the
+change applies from the next channel access procedure on.
+"""
+
+import math
+
+from config import Gap, Strategy
+
+
+class ChannelAccess(object):
+    """LBT with a random backoff: no gap period, reservation signal or CR slots"""
+    gap_before_backoff = False  # gap period between prioritization and backoff
+    backoff_in_gap = False  # the backoff runs in the middle of the gap period (no backoff of its own)
+    abort_busy_zero_backoff = False  # restart when the backoff counter is 0 but the channel is busy
+    split_backoff = False  # gap period inserted in the backoff, backoff_slots_to_leave slots before its end
+    gap_after_backoff = False  # gap period between backoff and transmission
+    cca_after_gap = False  # abort when the channel is busy after the gap
+    cr_slots = False  # contention resolution slots after the backoff
+    reservation_signal = False  # reservation signal until the sync slot boundary, before the data
+
+    def __init__(self, configGNB):
+        self.configGNB = configGNB
+
+    def backoff_value(self, gnb):
+        """Binary exponential backoff over the contention window of the priority class"""
+        cw_min = self.configGNB.priority_class_values.cw_min
+        cw_max = self.configGNB.priority_class_values.cw_max
+        upper_limit = (pow(2, gnb.failed_transmissions_in_row) * (cw_min + 1)) - 1
+        upper_limit = (upper_limit if upper_limit <= cw_max else cw_max)
+        return gnb.backoff_rng.integers(upper_limit + 1)
+
+    def cr_slot_count(self, time_to_next_sync_slot):
+        """CR slots that fit before the sync slot boundary"""
+        return math.floor(time_to_next_sync_slot / self.configGNB.t_cr_slot)
+
+    def prob_rs_first_slot(self):
+        return self.configGNB.prob_rs_first_slot
+
+
+class GapPeriodLbt(ChannelAccess):
+    """Gap period aligning the transmission to the sync slot boundary, placed as configGNB.gap_type says"""
+
+    def __init__(self, configGNB):
+        super().__init__(configGNB)
+        gap = configGNB.gap_type
+        self.gap_before_backoff = gap in (Gap.BEFORE, Gap.INSIDE)
+        self.backoff_in_gap = gap == Gap.INSIDE
+        self.abort_busy_zero_backoff = gap == Gap.BEFORE
+        self.split_backoff = gap == Gap.DURING
+        self.gap_after_backoff = gap in (Gap.AFTER, Gap.AFTER_WITH_CCA)
+        self.cca_after_gap = gap in (Gap.AFTER_WITH_CCA, Gap.INSIDE)
+
+
+class RsSignalLbt(ChannelAccess):
+    reservation_signal = True
+
+
+class CrLbt(ChannelAccess):
+    cr_slots = True
+
+    def prob_rs_first_slot(self):
+        return 0
+
+
+class EcrLbt(ChannelAccess):
+    cr_slots = True
+
+
+class GcrLbt(EcrLbt):
+    """eCR-LBT with a fixed number of CR slots (mini-slot sync grid)"""
+
+    def cr_slot_count(self, time_to_next_sync_slot):
+        return self.configGNB.num_cr_slots
+
+
+class DbLbt(ChannelAccess):
+    """Deterministic backoff, switching to a random one every switch_mode_periodicity failures"""
+    reservation_signal = True
+
+    def backoff_value(self, gnb):
+        configGNB = self.configGNB
+        if (gnb.failed_transmissions_in_row % configGNB.switch_mode_periodicity < configGNB.switch_mode_threshold) \
+                and (gnb.env.now != 0):
+            back_off_value = configGNB.initial_det_backoff_value + gnb.backoff_interrupt_counter
+            gnb.backoff_interrupt_counter = 0
+            return back_off_value
+        return gnb.backoff_rng.integers(configGNB.switch_mode_periodicity)
+
+
+ACCESS_CLASSES = {Strategy.GAP_PERIOD: GapPeriodLbt,
+                  Strategy.RS_SIGNAL: RsSignalLbt,
+                  Strategy.CR_LBT: CrLbt,
+                  Strategy.ECR_LBT: EcrLbt,
+                  Strategy.GCR_LBT: GcrLbt,
+                  Strategy.DB_LBT: DbLbt}
+
+
+def access_for(configGNB):
+    """ChannelAccess of a gNB configuration"""
+    return ACCESS_CLASSES[configGNB.strategy](configGNB)
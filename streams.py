@@ -0,0 +1,65 @@
+import math
+
+import numpy
+
+# independent random streams of a node, one per purpose
+PURPOSES = ('backoff', 'cr_action', 'traffic', 'subframe')
+NODE_TYPES = ('gnb', 'ap')
+
+
+class BufferedStream(object):
+    """
+    Uniform variates of a numpy Generator drawn block_size at a time and handed out one by one.
+    The values come out in the order the generator produces them, so the block size does not change a run.
+    """
+
+    def __init__(self, generator, block_size=1024):
+        self.generator = generator
+        self.block_size = block_size
+        self.block = []  # reversed, the next value is the last one
+
+    def random(self):
+        """Uniform on [0, 1)"""
+        if not self.block:
+            self.block = self.generator.random(self.block_size)[::-1].tolist()
+        return self.block.pop()
+
+    def integers(self, high):
+        """Uniform integer on [0, high), bias below high / 2**53"""
+        return int(self.random() * high)
+
+    def exponential(self, scale):
+        return -scale * math.log(1.0 - self.random())
+
+
+class RandomStreams(object):
+    """
+    numpy Generators of one run, all spawned from the run's SeedSequence.
+    A stream is keyed by (node type, node id, purpose) and not by creation order, so node i of a run draws the same
+    numbers whatever the strategy or the other nodes do: runs of different strategies with the same seed use common
+    random numbers.
+    """
+
+    def __init__(self, seed=None, block_size=1024):
+        """
+        :param seed: run seed (None = fresh OS entropy)
+        :param block_size: uniforms pre-drawn at once by every node stream
+        """
+        self.seed_sequence = numpy.random.SeedSequence(seed)
+        self.block_size = block_size
+
+    def _generator(self, *key):
+        sequence = numpy.random.SeedSequence(self.seed_sequence.entropy, spawn_key=key)
+        return numpy.random.Generator(numpy.random.PCG64(sequence))
+
+    def run_stream(self):
+        """Stream of the run-level draws (gNB desync offsets)"""
+        return self._generator(0)
+
+    def node_generator(self, node_type, nid, purpose):
+        """Generator of one node and purpose, for block draws"""
+        return self._generator(1, NODE_TYPES.index(node_type), nid, PURPOSES.index(purpose))
+
+    def node_stream(self, node_type, nid, purpose):
+        """BufferedStream of one node and purpose"""
+        return BufferedStream(self.node_generator(node_type, nid, purpose), self.block_size)
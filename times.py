@@ -1,6 +1,9 @@
+import functools
 import math
 import string
 
+import numpy
+
 # MCS: Modulation and Coding Scheme [Data rate, Control rate]
 # 802.11a
 MCS = {
@@ -26,6 +29,9 @@ MCS_ac = {
     8: [78, 24],
 }
 
+MAX_PAYLOAD = 2304  # [B] largest payload in the airtime tables (802.11 maximum MSDU)
+MAX_AMPDU = 64  # largest number of aggregated MPDUs in the airtime tables
+
 
 class Times:
     aSlotTime = 9  # [us]
@@ -47,6 +53,7 @@ class Times:
         self.payload = payload
         self.mcs = mcs
         self.nss = nss
+        self.standard = standard
 
         if standard == "802.11a":
             self.phy_data_rate = MCS[mcs][0] * pow(10, -6)  # [Mb/us] Possible values 6, 9, 12, 18, 24, 36, 48, 54
@@ -65,11 +72,19 @@ class Times:
         self.OFDMSignal = 24 / self.ctr_rate  # [us]
         self.aIFSn = aIFSn
         self.DIFSTime = aIFSn * Times.aSlotTime + Times.aSIFSTime
+        # airtime of a PPDU of this payload per nAMPDU, from the shared table
+        self.ppdu_times = ppdu_time_table(standard, mcs, nss)[payload].tolist() if payload <= MAX_PAYLOAD else None
+        self.ack_time = self.compute_ack_frame_time()
 
     def get_ppdu_frame_time(self, nAMPDU):
         """
         :param nAMPDU: number of MPDU sub-frames aggregated with a single leading PHY header
         """
+        if self.ppdu_times is not None and nAMPDU <= MAX_AMPDU:
+            return self.ppdu_times[nAMPDU]
+        return self.compute_ppdu_frame_time(nAMPDU)
+
+    def compute_ppdu_frame_time(self, nAMPDU):
         msdu = self.payload * 8  # Mac Service Data Unit
         mac_frame = nAMPDU * Times.mac_overhead + msdu  # [b] --> MAC Frame
         ppdu_padding = math.ceil(
@@ -81,6 +96,9 @@ class Times:
         return ppdu_tx_time
 
     def get_ack_frame_time(self):
+        return self.ack_time
+
+    def compute_ack_frame_time(self):
         ack = Times._overhead + Times.ack_size  # [b]
         ack = self.OFDMPreamble + self.OFDMSignal + ack / self.ctr_rate  # [us]
         ack_tx_time = Times.aSIFSTime + ack
@@ -92,5 +110,34 @@ class Times:
         return 2 * Times.aSIFSTime + (14 * 8 / self.ctr_rate) + Times.DIFSTime + (20 * 8 / self.ctr_rate)
 
 
+@functools.lru_cache(maxsize=None)
+def ppdu_time_table(standard, mcs, nss):
+    """
+    Read-only table of PPDU airtimes [us] indexed by [payload, nAMPDU] (payload up to MAX_PAYLOAD bytes, nAMPDU up to
+    MAX_AMPDU), computed in one vectorised pass with the same arithmetic as Times.compute_ppdu_frame_time.
+    Built once per process and shared by every Times of the same rate.
+    """
+    if standard == "802.11a":
+        phy_data_rate = MCS[mcs][0] * pow(10, -6)
+        data_rate = MCS[mcs][0]
+        ctr_rate = MCS[mcs][1]
+    else:
+        phy_data_rate = nss * MCS_ac[mcs][0] * pow(10, -6)
+        data_rate = nss * MCS_ac[mcs][0]
+        ctr_rate = MCS_ac[mcs][1]
+    n_data = 4 * phy_data_rate
+    ofdm_header = 16 + 24 / ctr_rate  # preamble + signal [us]
+
+    msdu = numpy.arange(MAX_PAYLOAD + 1, dtype=float)[:, None] * 8
+    mac_frame = numpy.arange(MAX_AMPDU + 1, dtype=float)[None, :] * Times.mac_overhead + msdu
+    bits = Times._overhead + mac_frame
+    cpsdu = bits + (numpy.ceil(bits / n_data) * n_data - bits)
+    table = numpy.ceil(ofdm_header + cpsdu / data_rate).astype(numpy.int64)
+    table.flags.writeable = False
+    return table
 
 
+@functools.lru_cache(maxsize=None)
+def get_times(payload=1024, mcs=7, aIFSn=3, standard="802.11a", nss=3):
+    """Times shared by every node with the same parameters (read only)"""
+    return Times(payload, mcs, aIFSn, standard, nss)
@@ -0,0 +1,132 @@
+from collections import deque
+from enum import IntEnum
+
+
+class TraceEvent(IntEnum):
+    SYNC_OFFSET = 1
+    PROCEDURE_START = 2
+    BACKOFF_DRAWN = 3
+    BACKOFF_START = 4
+    BACKOFF_END = 5
+    BACKOFF_FROZEN = 6
+    BACKOFF_ABORTED = 7
+    CHANNEL_BUSY = 8
+    PRIORITIZATION_START = 9
+    PRIORITIZATION_END = 10
+    PRIORITIZATION_FAILED = 11
+    DEFER_START = 12
+    DEFER_IDLE = 13
+    DEFER_BUSY = 14
+    GAP_START = 15
+    GAP_FIRST_HALF = 16
+    GAP_BACKOFF = 17
+    GAP_SECOND_HALF = 18
+    GAP_BUSY = 19
+    SPLIT_BACKOFF = 20
+    SPLIT_GAP = 21
+    SPLIT_RESUME = 22
+    CR_SLOTS_START = 23
+    CR_RS_START = 24
+    CR_RS_END = 25
+    CR_ACTION = 26
+    CR_ABORTED = 27
+    SLOT_SKIPPED = 28
+    TX_START = 29
+    TX_END = 30
+    TX_SUCCESS = 31
+    TX_COLLISION = 32
+
+
+# message templates, only formatted when a trace is read
+TRACE_MESSAGES = {
+    TraceEvent.SYNC_OFFSET: "selected random sync slot offset equal to {} us",
+    TraceEvent.PROCEDURE_START: "begins new transmission procedure",
+    TraceEvent.BACKOFF_DRAWN: "has drawn a random backoff counter = {}",
+    TraceEvent.BACKOFF_START: "(re)starting backoff procedure (slots to wait: {})",
+    TraceEvent.BACKOFF_END: "Backoff has ended - wait for short switching time from sensing to tx: {}",
+    TraceEvent.BACKOFF_FROZEN: "Channel BUSY - backoff is frozen. Remaining slots: {}",
+    TraceEvent.BACKOFF_ABORTED: "Remaining backoff slots is 0 but channel is busy, aborting transmission",
+    TraceEvent.CHANNEL_BUSY: "is sensing channel busy (for at least {} us)",
+    TraceEvent.PRIORITIZATION_START: "prioritization period has started",
+    TraceEvent.PRIORITIZATION_END: "prioritization period has finished",
+    TraceEvent.PRIORITIZATION_FAILED: "channel BUSY - prioritization period failed.",
+    TraceEvent.DEFER_START: "channel is idle, m is {}, waiting for deter period ({} us)",
+    TraceEvent.DEFER_IDLE: "Checking the channel after deter period: IDLE - wait {} observation slots",
+    TraceEvent.DEFER_BUSY: "Checking the channel after deter period: BUSY - wait for idle channel",
+    TraceEvent.GAP_START: "calculating and waiting the gap period ({:.0f} us)",
+    TraceEvent.GAP_FIRST_HALF: "waiting first half of the gap period ({:.0f} us)",
+    TraceEvent.GAP_BACKOFF: "(re)starting backoff procedure in the middle of the gap (slots to wait: {})",
+    TraceEvent.GAP_SECOND_HALF: "waiting second half of the gap period ({:.0f} us)",
+    TraceEvent.GAP_BUSY: "Channel BUSY after gap period, aborting transmission",
+    TraceEvent.SPLIT_BACKOFF: "will wait {} slots before stopping backoff",
+    TraceEvent.SPLIT_GAP: "stopping backoff and inserting gap now",
+    TraceEvent.SPLIT_RESUME: "waiting remaining backoff slots ({}) after gap",
+    TraceEvent.CR_SLOTS_START: "will start {} cr-slots",
+    TraceEvent.CR_RS_START: "k = {}, will start transmission of short rs signal at the beginning of cr-slot for {} us",
+    TraceEvent.CR_RS_END: "k = {}, finished transmission of short rs signal at the beginning of cr-slot",
+    TraceEvent.CR_ACTION: "k = {}, will start cr-{} for {}",
+    TraceEvent.CR_ABORTED: "CR-LBT aborted - postpone the transmission - doubles the CW size - repeat backoff",
+    TraceEvent.SLOT_SKIPPED: "SKIPPING SLOT (will restart transmission procedure after {:.0f} us)",
+    TraceEvent.TX_START: "is now occupying the channel for the next {} us",
+    TraceEvent.TX_END: "frees the channel",
+    TraceEvent.TX_SUCCESS: "transmission was successful. Current CW={}",
+    TraceEvent.TX_COLLISION: "transmission resulted in a collision",
+}
+
+
+def no_trace(event, *args):
+    """Trace function of nodes that are not traced"""
+    pass
+
+
+class Tracer(object):
+    """
+    Bounded ring buffer of (time, node type, node id, event, args) records.
+    Nodes trace through the function returned by bind, arguments are stored as they are and only formatted on read.
+    """
+
+    def __init__(self, capacity=100000, nodes=None, events=None):
+        """
+        :param capacity: records kept (the oldest are dropped first)
+        :param nodes: (node type, id) pairs to trace, e.g. [('gnb', 0)] (None = all)
+        :param events: TraceEvent members or names to trace (None = all)
+        """
+        self.records = deque(maxlen=capacity)
+        self.nodes = None if nodes is None else {(node_type, nid) for node_type, nid in nodes}
+        self.events = None if events is None else {e if isinstance(e, TraceEvent) else TraceEvent[e] for e in events}
+
+    @classmethod
+    def from_config(cls, config):
+        """Tracer for a Config (None when tracing is off)"""
+        if not (config.trace or config.debug):
+            return None
+        return cls(config.trace_capacity, config.trace_nodes, config.trace_events)
+
+    def bind(self, env, node_type, nid):
+        """Trace function for one node: trace(event, *args)"""
+        if self.nodes is not None and (node_type, nid) not in self.nodes:
+            return no_trace
+        append = self.records.append
+        events = self.events
+
+        def trace(event, *args):
+            if events is None or event in events:
+                append((env.now, node_type, nid, event, args))
+        return trace
+
+    def format(self, record):
+        now, node_type, nid, event, args = record
+        name = 'gNB' if node_type == 'gnb' else 'AP'
+        return "{:.0f}|{}-{}\t: {}".format(now, name, nid, TRACE_MESSAGES[event].format(*args))
+
+    def lines(self):
+        return [self.format(record) for record in self.records]
+
+    def dump(self, path=None):
+        """Prints the buffered records, or writes them to path"""
+        if path is None:
+            for line in self.lines():
+                print(line)
+        else:
+            with open(path, 'w') as trace_file:
+                trace_file.write("\n".join(self.lines()) + "\n")
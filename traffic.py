@@ -0,0 +1,141 @@
+"""
+Frame arrivals of the nodes. A node holds its frames in a bounded FIFO FrameQueue fed by one of the traffic modes:
+ - 'saturated': a frame is always waiting (the queue never empties),
+ - 'poisson': exponential inter-arrival times with mean 1 / poisson_lambda ms,
+ - 'trace': arrival times (us) read from traffic_trace, a .npy or text file holding either one column of times
+   (every node of the type gets them all) or two columns (node id, time).
+Arrival times are generated in blocks with numpy and admitted to the queue when the node looks at it, so no SimPy
+process or event is created per frame.
+"""
+
+import math
+from collections import deque
+
+import numpy
+
+ARRIVAL_BLOCK_SIZE = 256
+
+
+def traffic_mode(node_config):
+    """Traffic mode of a ConfigGNB / ConfigAP (the poisson_lambda setting implies 'poisson')"""
+    if node_config.traffic is not None:
+        return node_config.traffic
+    return 'poisson' if node_config.poisson_lambda is not None else 'saturated'
+
+
+class PoissonArrivals(object):
+    def __init__(self, generator, poisson_lambda, block_size=ARRIVAL_BLOCK_SIZE):
+        self.generator = generator
+        self.mean_interval = 1e3 / poisson_lambda  # us
+        self.block_size = block_size
+        self.last = 0.0
+
+    def next_block(self):
+        block = self.last + numpy.cumsum(self.generator.exponential(self.mean_interval, self.block_size))
+        self.last = block[-1]
+        return block
+
+
+class TraceArrivals(object):
+    def __init__(self, times, block_size=ARRIVAL_BLOCK_SIZE):
+        self.times = numpy.sort(numpy.asarray(times, dtype=float))
+        self.block_size = block_size
+        self.position = 0
+
+    def next_block(self):
+        """Next arrival times (None once the trace is exhausted)"""
+        if self.position >= len(self.times):
+            return None
+        block = self.times[self.position:self.position + self.block_size]
+        self.position += len(block)
+        return block
+
+
+def load_arrival_trace(path, nid):
+    """Arrival times of node nid from a trace file"""
+    trace = numpy.load(path) if path.endswith('.npy') else numpy.loadtxt(path, ndmin=1)
+    if trace.ndim == 1:
+        return trace
+    return trace[trace[:, 0] == nid, 1]
+
+
+class FrameQueue(object):
+    """
+    Bounded FIFO of the arrival times of a node's frames, the head frame stays queued while it is being sent.
+    Counts arrivals, drops (arrivals to a full queue), frames served and their queueing delay (arrival to the start
+    of their channel access).
+    """
+
+    def __init__(self, arrivals=None, capacity=64):
+        """:param arrivals: PoissonArrivals / TraceArrivals (None = saturated)"""
+        self.arrivals = arrivals
+        self.capacity = capacity
+        self.frames = deque()
+        self.pending = []  # upcoming arrival times, reversed (the next one is the last)
+        self.arrived = 0
+        self.dropped = 0
+        self.served = 0
+        self.delay = 0  # total queueing delay of the served frames (us)
+
+    @classmethod
+    def for_node(cls, node_config, generator, nid):
+        """Queue of a node from its ConfigGNB / ConfigAP and traffic random generator"""
+        mode = traffic_mode(node_config)
+        if mode == 'saturated':
+            return cls(None, node_config.queue_size)
+        if mode == 'poisson':
+            return cls(PoissonArrivals(generator, node_config.poisson_lambda), node_config.queue_size)
+        if mode == 'trace':
+            return cls(TraceArrivals(load_arrival_trace(node_config.traffic_trace, nid)), node_config.queue_size)
+        raise ValueError("unknown traffic mode: {}".format(mode))
+
+    def next_arrival(self):
+        """Time of the next arrival (inf when there are no more)"""
+        if not self.pending:
+            block = self.arrivals.next_block()
+            if block is None:
+                return math.inf
+            self.pending = block[::-1].tolist()
+        return self.pending[-1]
+
+    def admit(self, now):
+        """Queues (or drops) every frame that arrived up to now"""
+        while self.next_arrival() <= now:
+            arrival = self.pending.pop()
+            self.arrived += 1
+            if len(self.frames) < self.capacity:
+                self.frames.append(arrival)
+            else:
+                self.dropped += 1
+
+    def start_service(self, now):
+        """Starts the channel access of the head frame, False when the queue is empty"""
+        if self.arrivals is None:
+            self.arrived += 1
+            self.served += 1
+            return True
+        self.admit(now)
+        if not self.frames:
+            return False
+        self.served += 1
+        self.delay += now - self.frames[0]
+        return True
+
+    def finish_service(self, now):
+        """Removes the head frame once it is sent"""
+        if self.arrivals is not None:
+            self.admit(now)
+            self.frames.popleft()
+
+    def reset_statistics(self):
+        """Restarts the counters (the queued frames stay)"""
+        self.arrived = 0
+        self.dropped = 0
+        self.served = 0
+        self.delay = 0
+
+    def report(self):
+        """Queue metrics merged into the node's run_simulation results"""
+        return {'arrivals': self.arrived,
+                'queue_drops': self.dropped,
+                'queue_delay': self.delay / self.served if self.served > 0 else math.nan}
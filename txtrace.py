@@ -0,0 +1,111 @@
+import json
+import os
+
+import numpy
+
+TRANSMISSION_DTYPE = numpy.dtype([('start', 'f8'),  # us
+                                  ('end', 'f8'),  # us
+                                  ('res_duration', 'f8'),  # reservation signal before the data (us)
+                                  ('node_type', 'u1'),  # index in NODE_TYPES
+                                  ('node_id', 'u2'),
+                                  ('kind', 'u1'),  # index in KINDS
+                                  ('collided', '?')])
+NODE_TYPES = ('gnb', 'ap')
+KINDS = ('data', 'rs')  # data transmission (with its reservation signal) or CR-slot RS burst
+KIND_DATA = 0
+KIND_RS = 1
+
+
+def no_record(transmission, kind):
+    """Record function of nodes when no transmission trace is taken"""
+    pass
+
+
+class TransmissionRecorder(object):
+    """
+    Appends every finished transmission of a run to a flat binary file of TRANSMISSION_DTYPE records.
+    The file is written through a memory-mapped window of chunk_rows records, so memory use does not grow with the run.
+    """
+
+    def __init__(self, path, chunk_rows=65536):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.rows = 0  # records written
+        self.file = open(path, 'wb+')
+        self.window = None
+        self.window_start = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """Recorder for a Config (None when the transmission trace is off)"""
+        if config.transmission_trace_path is None:
+            return None
+        return cls(config.transmission_trace_path)
+
+    def _map_next_window(self):
+        if self.window is not None:
+            self.window.flush()
+        self.window_start = self.rows
+        self.file.truncate((self.rows + self.chunk_rows) * TRANSMISSION_DTYPE.itemsize)
+        self.window = numpy.memmap(self.file, dtype=TRANSMISSION_DTYPE, mode='r+',
+                                   offset=self.rows * TRANSMISSION_DTYPE.itemsize, shape=(self.chunk_rows,))
+
+    def append(self, start, end, res_duration, node_type, node_id, kind, collided):
+        if self.window is None or self.rows - self.window_start == self.chunk_rows:
+            self._map_next_window()
+        self.window[self.rows - self.window_start] = (start, end, res_duration, node_type, node_id, kind, collided)
+        self.rows += 1
+
+    def bind(self, node_type, nid):
+        """Record function for one node: record(transmission, kind)"""
+        type_index = NODE_TYPES.index(node_type)
+        append = self.append
+
+        def record(transmission, kind):
+            append(transmission.start_time, transmission.end_time, getattr(transmission, 'res_duration', 0),
+                   type_index, nid, kind, transmission.collided)
+        return record
+
+    def close(self):
+        if self.window is not None:
+            self.window.flush()
+            self.window = None
+        self.file.truncate(self.rows * TRANSMISSION_DTYPE.itemsize)
+        self.file.close()
+
+
+def load_transmissions(path):
+    """Read-only memory-mapped structured array of a transmission trace"""
+    if os.path.getsize(path) == 0:
+        return numpy.zeros(0, dtype=TRANSMISSION_DTYPE)
+    return numpy.memmap(path, dtype=TRANSMISSION_DTYPE, mode='r')
+
+
+def export_trace_events(transmissions, path):
+    """
+    Writes transmissions in the Chrome trace-event JSON format (open in Perfetto or chrome://tracing):
+    one process per node type, one thread per node, reservation signals as their own slices.
+    """
+    events = list()
+    for pid, node_type in enumerate(NODE_TYPES):
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': node_type}})
+    for pid, tid in sorted(set(zip(transmissions['node_type'].tolist(), transmissions['node_id'].tolist()))):
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                       'args': {'name': '{}-{}'.format(NODE_TYPES[pid], tid)}})
+    for t in transmissions:
+        pid = int(t['node_type'])
+        tid = int(t['node_id'])
+        start = float(t['start'])
+        res_duration = float(t['res_duration'])
+        if t['kind'] == KIND_RS or res_duration > 0:
+            events.append({'name': 'rs', 'cat': 'rs', 'ph': 'X', 'pid': pid, 'tid': tid, 'ts': start,
+                           'dur': res_duration if t['kind'] == KIND_DATA else float(t['end']) - start})
+        if t['kind'] == KIND_DATA:
+            events.append({'name': 'collision' if t['collided'] else 'data', 'cat': 'data', 'ph': 'X', 'pid': pid,
+                           'tid': tid, 'ts': start + res_duration, 'dur': float(t['end']) - start - res_duration,
+                           'args': {'collided': bool(t['collided'])}})
+    with open(path, 'w') as trace_file:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_file)